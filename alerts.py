@@ -0,0 +1,90 @@
+import atexit
+import queue
+import threading
+
+_CLOSE = object()  # Sentinelle de fermeture du thread d'alertes
+
+
+class AlertWorker:
+    """
+    Diffuse les alertes dans un thread dédié : alert() dépose le message et rend la main immédiatement.
+
+    Le message est affiché puis lu par synthèse vocale. pyttsx3 n'est importé et initialisé qu'à la première
+    alerte, dans le thread qui s'en sert (le moteur doit être piloté depuis le thread qui l'a créé) ; s'il est
+    indisponible, les alertes restent affichées en console.
+    """
+
+    def __init__(self, rate=150, speech=True, maxsize=32):
+        """
+        Args:
+            rate (int): Débit de la voix, en mots par minute.
+            speech (bool): Lit les alertes à voix haute ; sinon, affichage seul.
+            maxsize (int): Alertes en attente au plus ; au-delà, les nouvelles sont ignorées.
+        """
+        self.rate = rate
+        self.speech = speech
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.engine = None
+        self.spoken = 0
+        self.dropped = 0  # Alertes ignorées faute de place
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def alert(self, message):
+        """Affiche l'alerte et la confie au thread de synthèse vocale, sans bloquer."""
+        print(message)
+        if not self.speech:
+            return
+        with self._lock:
+            if self._thread is None:  # Thread démarré à la première alerte seulement
+                self._thread = threading.Thread(target=self._run, name="alerts", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            message = self.queue.get()
+            if message is _CLOSE:
+                break
+            self._speak(message)
+
+    def _speak(self, message):
+        if self.engine is None:
+            try:
+                import pyttsx3
+
+                self.engine = pyttsx3.init()
+                self.engine.setProperty('rate', self.rate)
+            except Exception as e:  # Pilote audio absent (serveur, conteneur) : console uniquement
+                print(f"Synthèse vocale indisponible ({e}), alertes affichées seulement")
+                self.speech = False
+                return
+        if self.speech:
+            self.engine.say(message)
+            self.engine.runAndWait()
+            self.spoken += 1
+
+    def close(self, timeout=30.0):
+        """Attend la lecture des alertes en attente (au plus timeout secondes) et arrête le thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(_CLOSE)
+            thread.join(timeout)
+
+
+_SHARED = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_alert_worker():
+    """Thread d'alertes commun à tous les compteurs du processus, créé au premier appel."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = AlertWorker()
+        return _SHARED
@@ -0,0 +1,247 @@
+"""
+Comptage hors ligne, en parallèle, des vidéos archivées.
+
+Chaque vidéo d'un dossier (ou d'un manifeste : un chemin par ligne) est comptée jusqu'à la fin du fichier par
+un ObjectCounter headless, dans un pool de processus où chaque worker charge le modèle une seule fois. Pour
+chaque vidéo, le dossier de sortie reçoit counts.json (comptages, images traitées, durée) et les événements
+(events/). summary.csv récapitule toutes les vidéos.
+
+counts.json est écrit de façon atomique, en dernier : une vidéo qui l'a est terminée. Après un arrêt brutal,
+relancer la même commande ne traite que les vidéos restantes (les événements partiels sont effacés).
+
+Usage :
+    python batch_count.py /archives/2025-06-01 --out batch_results --workers 4
+    python batch_count.py manifest.txt --model yolo11n.pt --region 569,5 569,499 --idle-step 10
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".m4v")
+SUMMARY_FIELDS = ["video", "status", "in", "out", "frames", "source_frames", "seconds", "fps", "classwise", "error"]
+
+_MODEL = None  # Modèle chargé une fois par worker (cf. _init_worker)
+
+
+def discover(inputs):
+    """Liste triée et sans doublon des vidéos désignées par des dossiers, des fichiers vidéo ou des manifestes."""
+    videos = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS))
+        elif path.lower().endswith(VIDEO_EXTENSIONS):
+            videos.append(path)
+        else:  # Manifeste : un chemin par ligne, relatif au manifeste ; lignes vides et commentaires ignorés
+            base = os.path.dirname(os.path.abspath(path))
+            with open(path) as file:
+                for line in file:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        videos.append(os.path.join(base, line))
+    return sorted({os.path.abspath(video) for video in videos})
+
+
+def output_dir(out, video):
+    """Dossier de résultats d'une vidéo : nom du fichier plus empreinte du chemin (noms identiques dans deux dossiers)."""
+    stem = os.path.splitext(os.path.basename(video))[0]
+    return os.path.join(out, f"{stem}_{hashlib.sha1(video.encode()).hexdigest()[:8]}")
+
+
+def write_atomic(path, write):
+    """Écrit un fichier via un fichier temporaire renommé : jamais de fichier à moitié écrit après un arrêt brutal."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="") as file:
+        write(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+
+def _init_worker(model, threads):
+    """Initialise un worker : limite les threads de calcul et charge le modèle une seule fois pour toutes ses vidéos."""
+    global _MODEL
+    import cv2
+    import torch
+    from ultralytics import YOLO
+
+    cv2.setNumThreads(1)
+    torch.set_num_threads(threads)  # Évite que N workers se disputent tous les cœurs
+    _MODEL = YOLO(model)
+
+
+def _reset_trackers(model):
+    """Repart de trackers vides : sans cela, les IDs et pistes d'une vidéo se prolongeraient dans la suivante."""
+    for tracker in getattr(getattr(model, "predictor", None), "trackers", None) or []:
+        tracker.reset()
+
+
+def count_video(video, directory, options):
+    """
+    Compte une vidéo jusqu'à la fin du fichier dans le worker courant et écrit counts.json.
+
+    Returns:
+        (dict): Le contenu de counts.json, ou {"video", "status": "error", "error"} en cas d'échec.
+    """
+    import cv2
+
+    from motion_gate import AdaptiveRatePolicy, MotionGate
+    from pipeline import PipelineRunner
+    from tracker1 import ObjectCounter
+
+    events_dir = os.path.join(directory, "events")
+    shutil.rmtree(events_dir, ignore_errors=True)  # Événements partiels d'une exécution interrompue
+    os.makedirs(events_dir)
+    error_file = os.path.join(directory, "error.txt")
+    start = time.perf_counter()
+    try:
+        _reset_trackers(_MODEL)
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise IOError(f"Lecture impossible : {video}")
+        source_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        counter = ObjectCounter(
+            model=_MODEL,
+            region=options["region"],
+            headless=True,
+            alerts=False,  # Pas de synthèse vocale dans les workers : alertes seulement affichées
+            events_dir=events_dir,
+            events_format=options["events_format"],
+            roi_inference=options["roi_inference"],
+            roi_margin=options["roi_margin"],
+            full_frame_interval=options["full_frame_interval"],
+        )
+        gate = None
+        if options["idle_step"] > 1:
+            gate = MotionGate(options["region"], policy=AdaptiveRatePolicy(idle_step=options["idle_step"], active_step=1))
+        runner = PipelineRunner(video, counter, size=options["size"], frame_step=options["frame_step"],
+                                policy="block", loop=False, headless=True, gate=gate)
+        # frames() plutôt que run() : une interruption doit remonter, pas passer pour une fin de fichier
+        runner.start()
+        try:
+            for _ in runner.frames():
+                pass
+        finally:
+            runner.stop()
+            counter.event_sink.close()
+    except Exception as e:  # noqa: BLE001 - l'erreur est consignée et la vidéo sera retentée à la prochaine exécution
+        with open(error_file, "w") as file:
+            file.write(f"{type(e).__name__}: {e}\n")
+        return {"video": video, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    seconds = time.perf_counter() - start
+    frames = runner.stats["count"].frames
+    result = {
+        "video": video,
+        "status": "done",
+        **counter.counts(),
+        "frames": frames,
+        "source_frames": source_frames,
+        "seconds": round(seconds, 2),
+        "fps": round(frames / seconds, 2) if seconds > 0 else None,
+    }
+    write_atomic(os.path.join(directory, "counts.json"), lambda file: json.dump(result, file, ensure_ascii=False, indent=2))
+    if os.path.exists(error_file):
+        os.remove(error_file)
+    return result
+
+
+def write_summary(out, videos):
+    """Réécrit summary.csv à partir des résultats présents sur disque (y compris ceux des exécutions précédentes)."""
+    rows = []
+    for video in videos:
+        directory = output_dir(out, video)
+        counts_file = os.path.join(directory, "counts.json")
+        error_file = os.path.join(directory, "error.txt")
+        if os.path.exists(counts_file):
+            with open(counts_file) as file:
+                result = json.load(file)
+            result["classwise"] = json.dumps(result.get("classwise", {}), ensure_ascii=False)
+            rows.append(result)
+        elif os.path.exists(error_file):
+            with open(error_file) as file:
+                rows.append({"video": video, "status": "error", "error": file.read().strip()})
+        else:
+            rows.append({"video": video, "status": "pending"})
+
+    def write(file):
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    write_atomic(os.path.join(out, "summary.csv"), write)
+    return rows
+
+
+def _point(text):
+    x, y = text.split(",")
+    return int(x), int(y)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Dossiers, fichiers vidéo ou manifestes")
+    parser.add_argument("--out", default="batch_results")
+    parser.add_argument("--model", default="yolo11n.pt")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads-per-worker", type=int, help="Threads torch par worker (par défaut : cœurs / workers)")
+    parser.add_argument("--region", type=_point, nargs="+", default=[(569, 5), (569, 499)], help="Points x,y")
+    parser.add_argument("--size", type=int, nargs=2, default=(1020, 500), help="Taille de traitement des images")
+    parser.add_argument("--frame-step", type=int, default=2, help="Traite une image sur N")
+    parser.add_argument("--idle-step", type=int, default=0,
+                        help="Filtre de mouvement : une image sur N quand rien ne bouge près de la région (0 : désactivé)")
+    parser.add_argument("--roi-inference", action="store_true", help="Détection sur une bande autour de la région")
+    parser.add_argument("--roi-margin", type=int, default=80)
+    parser.add_argument("--full-frame-interval", type=int, default=30)
+    parser.add_argument("--events-format", choices=("csv", "parquet"), default="csv")
+    args = parser.parse_args()
+
+    videos = discover(args.inputs)
+    os.makedirs(args.out, exist_ok=True)
+    pending = [video for video in videos if not os.path.exists(os.path.join(output_dir(args.out, video), "counts.json"))]
+    print(f"{len(videos)} vidéos, {len(videos) - len(pending)} déjà comptées, {len(pending)} à traiter")
+
+    options = {
+        "region": args.region,
+        "size": tuple(args.size),
+        "frame_step": args.frame_step,
+        "idle_step": args.idle_step,
+        "roi_inference": args.roi_inference,
+        "roi_margin": args.roi_margin,
+        "full_frame_interval": args.full_frame_interval,
+        "events_format": args.events_format,
+    }
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+    start = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.model, threads)) as pool:
+            futures = {}
+            for video in pending:
+                directory = output_dir(args.out, video)
+                os.makedirs(directory, exist_ok=True)
+                futures[pool.submit(count_video, video, directory, options)] = video
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if result["status"] == "done":
+                    status = f"IN {result['in']} OUT {result['out']} ({result['frames']} images, {result['fps']} FPS)"
+                else:
+                    status = f"échec : {result['error']}"
+                print(f"[{done}/{len(pending)}] {os.path.basename(futures[future])} : {status}")
+
+    rows = write_summary(args.out, videos)
+    failed = sum(row["status"] == "error" for row in rows)
+    print(f"Terminé en {time.perf_counter() - start:.0f} s : {len(rows) - failed} vidéos comptées, {failed} en échec. "
+          f"Récapitulatif : {os.path.join(args.out, 'summary.csv')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark du chemin critique du comptage, sans poids YOLO.
+
+Un troupeau synthétique (nombre d'animaux, vitesse, durée de vie des pistes et proportion d'animaux qui
+franchissent la ligne configurables) alimente directement store_tracking_history, count_objects,
+save_label_to_csv et display_counts. Le benchmark mesure la latence par image (p50/p95/p99), le nombre de
+blocs mémoire alloués par image et l'évolution de la mémoire sur de longues exécutions.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_counting --animals 50 --frames 20000
+    python -m benchmarks.bench_counting --frames 1000000 --sample-every 100000   # dérive mémoire longue durée
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from ultralytics.utils.plotting import Annotator
+
+from benchmarks.common import summarize
+from tracker1 import NamesOnlyModel, ObjectCounter
+
+BOX_HALF_SIZE = (30, 20)
+
+
+class SyntheticHerd:
+    """Génère des pistes (boîtes, IDs, classes) d'animaux se déplaçant autour d'une ligne verticale."""
+
+    def __init__(self, animals=50, speed=6.0, lifetime=150, crossing_rate=0.3, line_x=569, size=(1020, 500), seed=0):
+        self.speed = speed
+        self.lifetime = lifetime
+        self.crossing_rate = crossing_rate
+        self.line_x = line_x
+        self.size = size
+        self.rng = random.Random(seed)
+        self.next_id = 1
+        self.tracks = [self._spawn() for _ in range(animals)]
+
+    def _spawn(self):
+        """Crée un animal : s'il doit franchir la ligne, il part d'un côté en se dirigeant vers elle."""
+        width, height = self.size
+        direction = self.rng.choice((-1, 1))
+        if self.rng.random() < self.crossing_rate:
+            x = self.line_x - direction * self.rng.uniform(self.speed, self.speed * self.lifetime / 2)
+            vx = direction * self.speed
+        else:  # S'éloigne de la ligne
+            x = self.line_x + direction * self.rng.uniform(2 * self.speed, width / 2)
+            vx = direction * self.speed / 2
+        track = [self.next_id, min(max(x, 0), width), self.rng.uniform(40, height - 40), vx,
+                 self.rng.uniform(-1, 1), self.lifetime]
+        self.next_id += 1
+        return track
+
+    def step(self):
+        """Avance le troupeau d'une image et renvoie (boxes, track_ids, clss) comme extract_tracks."""
+        width, height = self.size
+        for i, track in enumerate(self.tracks):
+            track[1] += track[3] + self.rng.uniform(-0.5, 0.5)
+            track[2] += track[4]
+            track[5] -= 1
+            if track[5] <= 0 or not (0 <= track[1] <= width and 0 <= track[2] <= height):
+                self.tracks[i] = self._spawn()
+        hw, hh = BOX_HALF_SIZE
+        boxes = np.array([(x - hw, y - hh, x + hw, y + hh) for _, x, y, *_ in self.tracks], dtype=np.float32)
+        return boxes, [track[0] for track in self.tracks], [0] * len(self.tracks)
+
+
+def rss_mb():
+    """Mémoire résidente courante du processus en Mo (Linux), sinon None."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        return None
+
+
+def run(args):
+    region = [(args.line_x, 5), (args.line_x, 499)]
+    counter = ObjectCounter(
+        model=NamesOnlyModel({0: "cow"}),
+        region=region,
+        events_dir=tempfile.mkdtemp(prefix="bench_counting_"),
+        vectorized_counting=not args.scalar,
+        max_track_age=args.max_track_age,
+        alerts=False,  # Pas de synthèse vocale pendant la mesure
+    )
+    counter.initialize_region()
+    counter.region_initialized = True
+    herd = SyntheticHerd(args.animals, args.speed, args.lifetime, args.crossing_rate, args.line_x, seed=args.seed)
+    blank = np.zeros((500, 1020, 3), dtype=np.uint8)
+
+    timings = {name: [] for name in ("store_tracking_history", "count_objects", "save_label_to_csv",
+                                     "display_counts", "total")}
+    blocks = []
+    if args.tracemalloc:
+        tracemalloc.start()
+    print(f"{'image':>9} {'pistes':>7} {'comptés':>8} {'store (Ko)':>11} {'RSS (Mo)':>9} {'traced (Ko)':>12}")
+
+    for frame in range(1, args.frames + 1):
+        boxes, track_ids, clss = herd.step()
+        counter.boxes, counter.track_ids, counter.clss = boxes, track_ids, clss
+        blocks_before = sys.getallocatedblocks()
+        start = time.perf_counter()
+
+        counter.track_state.next_frame()
+        t0 = time.perf_counter()
+        centroids, prev_positions = [], []
+        for box, track_id, cls in zip(boxes, track_ids, clss):
+            counter.store_tracking_history(track_id, box)
+            counter.store_classwise_counts(cls)
+            centroids.append(counter.track_history[track_id][-1])
+            prev_positions.append(counter.track_state.previous_position(track_id))
+        t1 = time.perf_counter()
+        if counter.vectorized_counting:
+            counter.count_objects_batch(centroids, prev_positions, track_ids, clss)
+        else:
+            for centroid, track_id, prev_position, cls in zip(centroids, track_ids, prev_positions, clss):
+                counter.count_objects(centroid, track_id, prev_position, cls)
+        t2 = time.perf_counter()
+        counter.record_counts()  # save_label_to_csv pour les nouveaux IDs comptés
+        t3 = time.perf_counter()
+        counter.annotator = Annotator(blank, line_width=counter.line_width)
+        counter.display_counts(blank)  # Les IDs sont déjà sauvegardés : seul le dessin est mesuré ici
+        t4 = time.perf_counter()
+
+        timings["store_tracking_history"].append(t1 - t0)
+        timings["count_objects"].append(t2 - t1)
+        timings["save_label_to_csv"].append(t3 - t2)
+        timings["display_counts"].append(t4 - t3)
+        timings["total"].append(t4 - start)
+        blocks.append(sys.getallocatedblocks() - blocks_before)
+
+        if frame % args.sample_every == 0 or frame == args.frames:
+            traced = f"{tracemalloc.get_traced_memory()[0] / 1024:12.0f}" if args.tracemalloc else f"{'-':>12}"
+            rss = rss_mb()
+            print(f"{frame:9d} {len(counter.track_state):7d} {len(counter.counted_ids):8d} "
+                  f"{counter.track_state.memory_usage() / 1024:11.0f} {rss if rss is not None else 0:9.1f} {traced}")
+
+    counter.event_sink.close()
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    print(f"\n{args.frames} images, {args.animals} animaux, {'scalaire (shapely)' if args.scalar else 'vectorisé'}")
+    for name, samples in timings.items():
+        print(summarize(name, samples))
+    print(f"Blocs alloués par image (net) : moyenne {np.mean(blocks):.1f}, max {np.max(blocks)}")
+    print(f"IN {counter.in_count} OUT {counter.out_count}, événements écrits : {counter.event_sink.written}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--animals", type=int, default=50, help="Animaux simultanément dans le champ")
+    parser.add_argument("--speed", type=float, default=6.0, help="Vitesse en pixels par image")
+    parser.add_argument("--lifetime", type=int, default=150, help="Durée de vie d'une piste en images")
+    parser.add_argument("--crossing-rate", type=float, default=0.3, help="Proportion d'animaux franchissant la ligne")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--sample-every", type=int, default=2000, help="Intervalle d'échantillonnage mémoire")
+    parser.add_argument("--line-x", type=int, default=569)
+    parser.add_argument("--max-track-age", type=int, default=90)
+    parser.add_argument("--scalar", action="store_true", help="Utilise le chemin shapely objet par objet")
+    parser.add_argument("--tracemalloc", action="store_true", help="Suit la mémoire Python allouée (plus lent)")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare la latence par image du comptage avec et sans rendu (annotation des boîtes, région et analytique).
+
+Les deux compteurs reçoivent exactement les mêmes pistes : l'inférence est faite une seule fois par
+image, puis process_tracks est chronométré sur le compteur annoté et sur le compteur headless.
+
+Sans vidéo, les pistes viennent du troupeau synthétique de bench_counting, sur des images de bruit à la
+taille de traitement : le coût du rendu se mesure alors sans poids YOLO (extract_tracks n'est pas mesuré).
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_headless cattlecount.mp4 --frames 300
+    python -m benchmarks.bench_headless --frames 2000 --animals 50    # pistes synthétiques, sans modèle
+"""
+
+import argparse
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.bench_counting import SyntheticHerd
+from benchmarks.common import summarize
+from tracker1 import NamesOnlyModel, ObjectCounter
+
+
+def video_tracks(counter, args):
+    """Images de la vidéo et durée d'extract_tracks, le compteur recevant les pistes détectées."""
+    cap = cv2.VideoCapture(args.video)
+    for _ in range(args.frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(frame, tuple(args.size))
+        start = time.perf_counter()
+        counter.extract_tracks(frame)
+        yield frame, time.perf_counter() - start
+    cap.release()
+
+
+def synthetic_tracks(counter, args):
+    """Images de bruit et pistes du troupeau synthétique, affectées au compteur comme par extract_tracks."""
+    width, height = args.size
+    herd = SyntheticHerd(args.animals, size=(width, height), line_x=569, seed=args.seed)
+    frame = np.random.default_rng(args.seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    for _ in range(args.frames):
+        counter.boxes, counter.track_ids, counter.clss = herd.step()
+        yield frame, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", nargs="?", help="Vidéo de test (par défaut : pistes synthétiques, sans modèle)")
+    parser.add_argument("--model", default="yolo11n.pt")
+    parser.add_argument("--animals", type=int, default=50, help="Animaux du troupeau synthétique")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=300, help="Nombre d'images mesurées")
+    parser.add_argument("--size", type=int, nargs=2, default=(1020, 500))
+    args = parser.parse_args()
+
+    region = [(569, 5), (569, 499)]
+    events_dir = tempfile.mkdtemp(prefix="bench_headless_")
+    model = args.model if args.video else NamesOnlyModel({0: "cow"})
+    rendered = ObjectCounter(region=region, model=model, show=False, events_dir=events_dir, alerts=False)
+    headless = ObjectCounter(region=region, model=rendered.model, headless=True, events_dir=events_dir, alerts=False)
+    source = video_tracks if args.video else synthetic_tracks
+
+    inference, with_render, without_render = [], [], []
+    for frame, extract_time in source(rendered, args):
+        inference.append(extract_time or 0.0)
+        headless.boxes, headless.track_ids, headless.clss = rendered.boxes, rendered.track_ids, rendered.clss
+
+        start = time.perf_counter()
+        rendered.process_tracks(frame.copy())
+        with_render.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        headless.process_tracks(frame.copy())
+        without_render.append(time.perf_counter() - start)
+    for counter in (rendered, headless):
+        counter.event_sink.close()
+
+    print(f"{len(inference)} images, {args.size[0]}x{args.size[1]}, "
+          f"{'vidéo ' + args.video if args.video else f'{args.animals} pistes synthétiques'}")
+    if args.video:
+        print(summarize("extract_tracks", inference))
+    print(summarize("comptage + rendu", with_render))
+    print(summarize("comptage headless", without_render))
+    total_render = np.add(inference, with_render)
+    total_headless = np.add(inference, without_render)
+    print(summarize("total avec rendu", total_render))
+    print(summarize("total headless", total_headless))
+    print(f"Gain moyen par image : {(total_render.mean() - total_headless.mean()) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark du démarrage à froid d'ObjectCounter, tel que le paie un traitement par lots de courtes vidéos.
+
+Chaque mesure tourne dans un processus neuf : import de tracker1, construction du premier compteur puis des
+suivants, durée de l'appel à finalize() avec une alerte à lire, et délai jusqu'à la fin de la lecture de
+l'alerte. Le mode "eager" reproduit l'ancien comportement (pyttsx3 initialisé à chaque construction,
+synthèse vocale bloquante dans finalize) pour comparaison avec le mode "lazy" actuel.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_startup --runs 5 --counters 20
+    python -m benchmarks.bench_startup --model yolo11n.pt    # construction avec chargement des poids
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import summarize
+
+STEPS = ("import", "first_counter", "next_counter", "finalize", "alert_done")
+
+
+def child(args):
+    """Mesures d'un processus neuf, écrites en JSON sur la sortie standard."""
+    timings = {}
+    start = time.perf_counter()
+    from tracker1 import NamesOnlyModel, ObjectCounter
+    timings["import"] = time.perf_counter() - start
+
+    counter_class = ObjectCounter
+    if args.mode == "eager":
+
+        class EagerSpeechCounter(ObjectCounter):
+            """Comportement d'avant : moteur vocal initialisé à chaque construction, alerte bloquante."""
+
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs)
+                import pyttsx3
+
+                self.engine = pyttsx3.init()
+                self.engine.setProperty('rate', 150)
+
+            def alert(self, message):
+                self.engine.say(message)
+                self.engine.runAndWait()
+
+        counter_class = EagerSpeechCounter
+
+    events_dir = tempfile.mkdtemp(prefix="bench_startup_")
+
+    def build():
+        model = args.model if args.model else NamesOnlyModel({0: "cow"})
+        return counter_class(model=model, region=[(569, 5), (569, 499)], headless=True, events_dir=events_dir,
+                             expected_count=10)
+
+    start = time.perf_counter()
+    counter = build()
+    timings["first_counter"] = time.perf_counter() - start
+    samples = []
+    for _ in range(args.counters - 1):
+        start = time.perf_counter()
+        other = build()
+        samples.append(time.perf_counter() - start)
+        other.event_sink.close()
+    timings["next_counter"] = sum(samples) / len(samples) if samples else 0.0
+
+    counter.classwise_counts = {"cow": {"IN": 3, "OUT": 0}}  # Vaches manquantes : finalize() lance une alerte
+    start = time.perf_counter()
+    counter.finalize()
+    timings["finalize"] = time.perf_counter() - start
+    if counter.alert_worker is not None:
+        counter.alert_worker.close()
+    timings["alert_done"] = time.perf_counter() - start
+    print(json.dumps(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Processus neufs par mode")
+    parser.add_argument("--counters", type=int, default=20, help="Compteurs construits par processus")
+    parser.add_argument("--model", help="Poids YOLO à charger (par défaut : NamesOnlyModel, sans poids)")
+    parser.add_argument("--modes", nargs="+", choices=("lazy", "eager"), default=["lazy", "eager"])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", default="lazy", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for mode in args.modes:
+        command = [sys.executable, "-m", "benchmarks.bench_startup", "--child", "--mode", mode,
+                   "--counters", str(args.counters)] + (["--model", args.model] if args.model else [])
+        results = []
+        for _ in range(args.runs):
+            process = subprocess.run(command, cwd=root, capture_output=True, text=True)
+            lines = process.stdout.strip().splitlines()
+            if process.returncode != 0 or not lines:
+                print(f"{mode} : échec du processus de mesure\n{process.stderr.strip()[-500:]}")
+                break
+            results.append(json.loads(lines[-1]))
+        if results:
+            print(f"\nMode {mode} ({len(results)} processus, {args.counters} compteurs chacun)")
+            for step in STEPS:
+                print(summarize(step, [result[step] for result in results]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark de process_telemetry_data sur des réponses ThingsBoard synthétiques.
+
+Compare l'ancienne fusion pandas (_process_telemetry_data_merge), le pivot en une passe vers des colonnes
+typées (pivot_telemetry, entrée directe de store_telemetry_columns) et process_telemetry_data, qui ajoute
+la conversion en dictionnaires par ligne.
+
+Chaque clé (temperature, id, age, poids, active) reçoit n points {"ts", "value"} avec des valeurs au format
+texte renvoyé par l'API REST. Aucune connexion à ThingsBoard ni à PostgreSQL n'est ouverte.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.bench_telemetry --points 1000 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+
+from benchmarks.common import summarize
+from mqtt_client import _process_telemetry_data_merge, pivot_telemetry, process_telemetry_data
+
+
+def synthetic_payload(points, seed=0, start_ts=1_740_000_000_000, step_ms=1000):
+    """Réponse ThingsBoard synthétique : n points par clé, timestamps communs espacés de step_ms."""
+    rng = random.Random(seed)
+    timestamps = [start_ts + i * step_ms for i in range(points)]
+    return {
+        "temperature": [{"ts": ts, "value": f"{rng.uniform(20.0, 30.0):.1f}"} for ts in timestamps],
+        "id": [{"ts": ts, "value": f"cow-{rng.randint(1, 500)}"} for ts in timestamps],
+        "age": [{"ts": ts, "value": str(rng.randint(1, 10))} for ts in timestamps],
+        "poids": [{"ts": ts, "value": f"{rng.uniform(40.0, 400.0):.1f}"} for ts in timestamps],
+        "active": [{"ts": ts, "value": rng.choice(["true", "false"])} for ts in timestamps],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[1000, 10000, 100000, 300000], help="Points par clé")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions par taille")
+    args = parser.parse_args()
+
+    implementations = {
+        "fusion pandas": _process_telemetry_data_merge,
+        "pivot (colonnes)": pivot_telemetry,
+        "pivot + dicts": process_telemetry_data,
+    }
+    for points in args.points:
+        payload = synthetic_payload(points)
+        repeat = args.repeat if points < 1_000_000 else max(1, args.repeat // 5)
+        print(f"--- {points} points par clé")
+        best = {}
+        for name, fn in implementations.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                fn(payload)
+                samples.append(time.perf_counter() - start)
+            best[name] = min(samples)
+            print(summarize(name, samples) + f" | {points / best[name]:,.0f} points/s")
+        print(f"Accélération du pivot (colonnes) : x{best['fusion pandas'] / best['pivot (colonnes)']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
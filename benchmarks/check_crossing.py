@@ -0,0 +1,125 @@
+"""
+Vérification d'équivalence du comptage vectorisé (crossing.py) avec shapely, sans poids YOLO.
+
+1. Géométrie : segments_intersect et points_in_polygon sont comparés à LineString.intersects et
+   Polygon.contains sur des segments et points aléatoires, dont une part tirée sur une grille entière alignée
+   sur la région (contacts aux extrémités, segments colinéaires, points sur les bords, objets immobiles).
+2. Comptage : deux ObjectCounter, l'un vectorisé, l'autre sur le chemin shapely objet par objet, reçoivent
+   les mêmes pistes d'un troupeau synthétique ; comptages et IDs comptés doivent rester identiques à chaque image.
+
+Le script se termine en erreur (code 1) à la première divergence, avec le cas fautif.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.check_crossing --samples 200000 --frames 5000
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+
+import numpy as np
+from shapely.geometry import LineString, Point, Polygon
+
+from benchmarks.bench_counting import SyntheticHerd
+from crossing import points_in_polygon, segments_intersect
+from tracker1 import NamesOnlyModel, ObjectCounter
+
+LINES = [
+    [(569, 5), (569, 499)],  # Ligne de main.py
+    [(10, 250), (1010, 250)],
+    [(100, 50), (900, 450)],
+    [(300, 400), (700, 100)],
+]
+POLYGONS = [
+    [(500, 5), (640, 5), (640, 499), (500, 499)],
+    [(200, 100), (800, 150), (500, 450)],
+    [(100, 100), (900, 100), (900, 400), (500, 200), (100, 400)],  # Concave
+]
+
+
+def sample_points(rng, n, region):
+    """Points aléatoires : moitié flottants sur toute l'image, moitié sur une grille entière autour de la région."""
+    floats = np.column_stack([rng.uniform(-50, 1070, n), rng.uniform(-50, 550, n)])
+    region = np.asarray(region, dtype=float)
+    anchors = region[rng.integers(0, len(region), n)]
+    grid = anchors + rng.integers(-3, 4, (n, 2)) * rng.choice([1, 25, 100], (n, 1))
+    points = np.where(rng.random((n, 1)) < 0.5, floats, grid)
+    if len(region) > 2:  # Milieux des côtés : points exactement sur le bord
+        edges = (region + np.roll(region, -1, axis=0)) / 2
+        points[: len(edges)] = edges
+    return points
+
+
+def check_geometry(rng, samples):
+    """Compare crossing.py à shapely ; renvoie le nombre de cas testés ou lève AssertionError."""
+    tested = 0
+    for line in LINES:
+        shape = LineString(line)
+        a1 = sample_points(rng, samples, line)
+        a2 = sample_points(rng, samples, line)
+        a2[: samples // 20] = a1[: samples // 20]  # Objets immobiles : segment de longueur nulle
+        fast = segments_intersect(a1, a2, np.asarray(line[0], dtype=float), np.asarray(line[1], dtype=float))
+        for i in range(samples):
+            expected = shape.intersects(LineString([tuple(a1[i]), tuple(a2[i])]))
+            assert fast[i] == expected, f"segments_intersect {line} {a1[i].tolist()} -> {a2[i].tolist()} : " \
+                                        f"{bool(fast[i])} au lieu de {expected}"
+        tested += samples
+    for polygon in POLYGONS:
+        shape = Polygon(polygon)
+        points = sample_points(rng, samples, polygon)
+        fast = points_in_polygon(points, np.asarray(polygon, dtype=float))
+        for i in range(samples):
+            expected = shape.contains(Point(tuple(points[i])))
+            assert fast[i] == expected, f"points_in_polygon {polygon} {points[i].tolist()} : " \
+                                        f"{bool(fast[i])} au lieu de {expected}"
+        tested += samples
+    return tested
+
+
+def check_counting(frames, seed):
+    """Fait tourner côte à côte les chemins vectorisé et shapely ; renvoie (IN, OUT) ou lève AssertionError."""
+    counters = [
+        ObjectCounter(model=NamesOnlyModel({0: "cow"}), region=region, headless=True,
+                      events_dir=tempfile.mkdtemp(prefix="check_crossing_"), vectorized_counting=vectorized,
+                      alerts=False)
+        for region in (LINES[0], POLYGONS[0])
+        for vectorized in (True, False)
+    ]
+    herd = SyntheticHerd(animals=60, seed=seed)
+    blank = np.zeros((500, 1020, 3), dtype=np.uint8)
+    for frame in range(1, frames + 1):
+        boxes, track_ids, clss = herd.step()
+        for counter in counters:
+            counter.boxes, counter.track_ids, counter.clss = boxes, track_ids, clss
+            counter.process_tracks(blank)
+        for fast, reference in (counters[0:2], counters[2:4]):
+            assert (fast.in_count, fast.out_count, fast.counted_ids) == \
+                   (reference.in_count, reference.out_count, reference.counted_ids), \
+                f"image {frame}, région {fast.region} : vectorisé IN {fast.in_count} OUT {fast.out_count}, " \
+                f"shapely IN {reference.in_count} OUT {reference.out_count}"
+    for counter in counters:
+        counter.event_sink.close()
+    return [(counter.in_count, counter.out_count) for counter in counters[::2]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20000, help="Cas géométriques par région")
+    parser.add_argument("--frames", type=int, default=3000, help="Images du troupeau synthétique")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    try:
+        tested = check_geometry(np.random.default_rng(args.seed), args.samples)
+        print(f"Géométrie : {tested} cas identiques à shapely")
+        counts = check_counting(args.frames, args.seed)
+        print(f"Comptage : {args.frames} images identiques (ligne IN/OUT {counts[0]}, polygone IN/OUT {counts[1]})")
+    except AssertionError as e:
+        print(f"Divergence : {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
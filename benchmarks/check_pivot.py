@@ -0,0 +1,86 @@
+"""
+Vérification d'équivalence du pivot de télémétrie avec l'ancienne fusion pandas, sans ThingsBoard ni PostgreSQL.
+
+process_telemetry_data (pivot_telemetry puis columns_to_records) et _process_telemetry_data_merge reçoivent
+les mêmes réponses ThingsBoard synthétiques ; les listes d'enregistrements doivent être identiques, ordre
+et types Python compris. Les réponses couvrent les cas où le pivot et les jointures internes pourraient
+diverger : clés absentes ou vides, timestamps partiellement communs, listes non triées ou triées
+différemment d'une clé à l'autre, timestamps en double (repli sur la fusion), valeurs "active" de toutes
+les casses.
+
+Le script se termine en erreur (code 1) à la première divergence, avec la réponse fautive.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.check_pivot --cases 2000
+"""
+
+import argparse
+import json
+import random
+import sys
+
+from mqtt_client import TELEMETRY_KEYS, _process_telemetry_data_merge, process_telemetry_data
+
+ACTIVE_VALUES = ["true", "false", "True", "FALSE", "1", "0", "yes", ""]
+
+
+def value(rng, key):
+    """Valeur au format texte renvoyé par l'API REST de ThingsBoard."""
+    if key == "temperature":
+        return f"{rng.uniform(20.0, 30.0):.{rng.randint(0, 3)}f}"
+    if key == "id":
+        return f"cow-{rng.randint(1, 50)}"
+    if key == "age":
+        return str(rng.randint(0, 15))
+    if key == "poids":
+        return f"{rng.uniform(40.0, 400.0):.1f}"
+    return rng.choice(ACTIVE_VALUES)
+
+
+def random_payload(rng):
+    """Réponse ThingsBoard synthétique tirée parmi les cas limites du pivot."""
+    points = rng.choice([0, 1, 2, 5, 50, 300])
+    base = rng.sample(range(1_740_000_000_000, 1_740_000_000_000 + 1000 * (points * 3 + 1), 1000), points)
+    if rng.random() < 0.5:
+        base.sort(reverse=rng.random() < 0.3)  # ThingsBoard renvoie par défaut les plus récents d'abord
+    payload = {}
+    for key in TELEMETRY_KEYS:
+        if rng.random() < 0.05:
+            continue  # Clé absente de la réponse
+        ts = [t for t in base if rng.random() < 0.9] if rng.random() < 0.5 else list(base)
+        ts += [base[-1] + 1000 * i for i in range(1, rng.randint(0, 3) + 1)] if base else []  # Hors intersection
+        if rng.random() < 0.3:
+            rng.shuffle(ts)
+        if ts and rng.random() < 0.03:
+            ts.append(rng.choice(ts))  # Timestamp en double : le pivot renvoie None et process_* se replie
+        payload[key] = [{"ts": t, "value": value(rng, key)} for t in ts]
+    return payload
+
+
+def typed(records):
+    """Enregistrements avec le type de chaque valeur : 1 == True et 1.0 == 1 masqueraient un changement de type."""
+    return [{key: (type(val).__name__, val) for key, val in record.items()} for record in records]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=1000, help="Réponses synthétiques comparées")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = 0
+    for case in range(args.cases):
+        payload = random_payload(rng)
+        expected = _process_telemetry_data_merge(payload)
+        got = process_telemetry_data(payload)
+        if typed(got) != typed(expected):
+            print(f"Divergence au cas {case} : {len(got)} enregistrements au lieu de {len(expected)}")
+            print(json.dumps(payload)[:2000])
+            sys.exit(1)
+        records += len(expected)
+    print(f"{args.cases} réponses, {records} enregistrements identiques à la fusion pandas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""Outils partagés par les benchmarks : résumés de latence en percentiles."""
+
+import numpy as np
+
+
+def percentiles(samples, q=(50, 95, 99)):
+    """Percentiles en millisecondes d'une liste de durées en secondes."""
+    if not len(samples):
+        return [0.0] * len(q)
+    return np.percentile(np.asarray(samples) * 1000, q).tolist()
+
+
+def summarize(name, samples):
+    """Ligne de résumé p50/p95/p99 en millisecondes."""
+    p50, p95, p99 = percentiles(samples)
+    return f"{name:<22} p50 {p50:7.3f} ms | p95 {p95:7.3f} ms | p99 {p99:7.3f} ms"
@@ -0,0 +1,140 @@
+"""
+Test de charge de l'endpoint /fetch_and_store contre un ThingsBoard simulé et un PostgreSQL local.
+
+Le script démarre dans des threads un faux serveur ThingsBoard (télémétrie synthétique, un point toutes les
+--step-ms millisecondes par device, limite de points par requête respectée, latence réglable) et le service
+de mqtt_client, pointé vers ce faux serveur. Des appelants concurrents interrogent ensuite /fetch_and_store ;
+le script affiche la latence (p50/p95/p99), le débit de requêtes et le nombre de lignes stockées.
+
+PostgreSQL doit tourner en local (variables PG_HOST, PG_PORT, PG_DBNAME, PG_USER, PG_PASSWORD).
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.load_fetch_and_store --devices 20 --callers 16 --requests 10
+    python -m benchmarks.load_fetch_and_store --reset --lookback-min 600 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Query
+
+from benchmarks.common import summarize
+
+MOCK_PORT = 8765
+SERVICE_PORT = 8766
+
+
+def mock_thingsboard(step_ms, latency_ms):
+    """Application imitant l'API de télémétrie de ThingsBoard : points les plus récents d'abord, limit par clé."""
+    mock = FastAPI()
+    mock.state.requests = 0
+
+    @mock.get("/api/plugins/telemetry/DEVICE/{device_id}/values/timeseries")
+    async def timeseries(device_id: str, keys: str, startTs: int, endTs: int, limit: int = Query(100)):
+        mock.state.requests += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        first = -(-startTs // step_ms) * step_ms
+        timestamps = range(first, endTs, step_ms)[::-1][:limit]
+        seed = sum(device_id.encode())
+        return {
+            "temperature": [{"ts": ts, "value": f"{20 + (ts // step_ms + seed) % 100 / 10:.1f}"} for ts in timestamps],
+            "id": [{"ts": ts, "value": f"{device_id}-cow-{(ts // step_ms) % 50}"} for ts in timestamps],
+            "age": [{"ts": ts, "value": str(1 + (ts // step_ms) % 10)} for ts in timestamps],
+            "poids": [{"ts": ts, "value": f"{40 + (ts // step_ms + seed) % 3600 / 10:.1f}"} for ts in timestamps],
+            "active": [{"ts": ts, "value": "true" if (ts // step_ms) % 2 else "false"} for ts in timestamps],
+        }
+
+    return mock
+
+
+def start_server(app, port):
+    """Démarre uvicorn dans un thread et attend qu'il accepte les connexions."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Le serveur du port {port} n'a pas démarré")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def load(url, callers, requests_per_caller):
+    """callers appelants concurrents envoient chacun requests_per_caller requêtes ; renvoie latences et bilans."""
+    latencies, results = [], []
+
+    async def caller(client):
+        for _ in range(requests_per_caller):
+            start = time.perf_counter()
+            response = await client.get(url)
+            latencies.append(time.perf_counter() - start)
+            results.append(response.json() if response.status_code == 200 else {"status": response.status_code})
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        await asyncio.gather(*(caller(client) for _ in range(callers)))
+    return latencies, results
+
+
+def reset(service, device_ids):
+    """Efface les points de reprise des devices simulés : la première vague de requêtes refait tout le rattrapage."""
+    import psycopg2
+
+    conn = psycopg2.connect(**service.PG_SETTINGS)
+    with conn.cursor() as cur:
+        cur.execute("CREATE TABLE IF NOT EXISTS sync_state (device_id TEXT PRIMARY KEY, last_ts BIGINT NOT NULL);")
+        cur.execute("DELETE FROM sync_state WHERE device_id = ANY(%s);", (device_ids,))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=20, help="Devices simulés synchronisés par requête")
+    parser.add_argument("--callers", type=int, default=16, help="Appelants concurrents")
+    parser.add_argument("--requests", type=int, default=10, help="Requêtes par appelant")
+    parser.add_argument("--step-ms", type=int, default=1000, help="Intervalle entre deux points simulés")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Latence ajoutée par le faux ThingsBoard")
+    parser.add_argument("--lookback-min", type=int, default=60, help="Historique rattrapé au premier passage")
+    parser.add_argument("--reset", action="store_true", help="Efface les points de reprise des devices simulés")
+    args = parser.parse_args()
+
+    # Le service lit l'URL de ThingsBoard à l'import
+    os.environ["THINGSBOARD_API_URL"] = f"http://127.0.0.1:{MOCK_PORT}/api/plugins/telemetry/DEVICE"
+    import mqtt_client as service
+
+    device_ids = [f"load-device-{i:04d}" for i in range(args.devices)]
+    service.DEVICE_IDS = device_ids
+    service.INITIAL_LOOKBACK_MS = args.lookback_min * 60 * 1000
+    if args.reset:
+        reset(service, device_ids)
+
+    mock = mock_thingsboard(args.step_ms, args.latency_ms)
+    mock_server, mock_thread = start_server(mock, MOCK_PORT)
+    service_server, service_thread = start_server(service.app, SERVICE_PORT)
+
+    start = time.perf_counter()
+    latencies, results = asyncio.run(
+        load(f"http://127.0.0.1:{SERVICE_PORT}/fetch_and_store", args.callers, args.requests)
+    )
+    elapsed = time.perf_counter() - start
+
+    service_server.should_exit = mock_server.should_exit = True
+    service_thread.join()
+    mock_thread.join()
+
+    errors = sum(result.get("status") != "success" for result in results)
+    stored = sum(result.get("stored_records", 0) for result in results)
+    print(f"{len(latencies)} requêtes ({args.callers} appelants, {args.devices} devices) en {elapsed:.2f} s "
+          f": {len(latencies) / elapsed:.1f} req/s, {errors} en erreur ou partielles")
+    print(summarize("fetch_and_store", latencies))
+    print(f"Lignes stockées : {stored}, requêtes reçues par le faux ThingsBoard : {mock.state.requests}")
+
+
+if __name__ == "__main__":
+    main()
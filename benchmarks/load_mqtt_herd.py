@@ -0,0 +1,198 @@
+"""
+Générateur de charge MQTT : simule un troupeau de colliers depuis un seul processus.
+
+Chaque collier est une tâche asyncio qui publie un relevé (generate_telemetry de data.py) toutes les --interval
+secondes en moyenne, à une cadence propre tirée dans ±--jitter : soit un message par attribut (format
+historique du simulateur), soit un seul message JSON (--packed, accepté par mqtt_ingest.py). Les colliers se
+partagent --connections connexions MQTT.
+
+Le script affiche le débit atteint (messages publiés et acquittés par seconde) et la latence publication ->
+acquittement, mesurée par le mid renvoyé dans on_publish : PUBACK en QoS 1, PUBCOMP en QoS 2, simple écriture
+sur le socket en QoS 0.
+
+Usage (depuis la racine du dépôt) :
+    python -m benchmarks.load_mqtt_herd --devices 5000 --interval 10 --qos 1 --duration 120
+    python -m benchmarks.load_mqtt_herd --devices 5000 --packed --embedded-broker --port 1883 --no-tls
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+from benchmarks.common import summarize
+from data import MQTT_BROKER, MQTT_PORT, PASSWORD, USERNAME, attribute_messages, generate_telemetry, packed_message
+from publisher import make_client
+
+
+class AckTracker:
+    """Associe chaque mid publié sur une connexion à son instant d'envoi, jusqu'à l'appel de on_publish."""
+
+    def __init__(self, keep=1_000_000):
+        self.inflight = {}  # mid -> instant d'envoi
+        self.early = {}  # mid -> instant d'acquittement arrivé avant l'enregistrement du mid
+        self.latencies = deque(maxlen=keep)
+        self.window = []  # Latences depuis le dernier rapport
+        self.published = 0
+        self.acked = 0
+        self._lock = threading.Lock()
+
+    def sent(self, mid, start):
+        with self._lock:
+            self.published += 1
+            acked = self.early.pop(mid, None)
+            if acked is None:
+                self.inflight[mid] = start
+            else:
+                self._ack(acked - start)
+
+    def on_publish(self, client, userdata, mid):
+        now = time.perf_counter()
+        with self._lock:
+            start = self.inflight.pop(mid, None)
+            if start is None:
+                self.early[mid] = now
+            else:
+                self._ack(now - start)
+
+    def _ack(self, latency):
+        self.acked += 1
+        self.latencies.append(latency)
+        self.window.append(latency)
+
+    def take_window(self):
+        with self._lock:
+            window, self.window = self.window, []
+        return window
+
+
+async def collar(index, client, client_id, tracker, interval, args, rng):
+    """
+    Un collier : publie un relevé toutes les interval secondes, en rattrapant les retards de la boucle.
+
+    Les topics portent client_id, l'identifiant de la connexion utilisée : OpenRemote refuse les publications
+    writeattributevalue dont le topic désigne un autre client.
+    """
+    asset_id = f"collar{index:05d}"
+    loop = asyncio.get_running_loop()
+    next_at = loop.time() + rng.uniform(0, interval)  # Départs étalés sur le premier intervalle
+    while True:
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+        telemetry = generate_telemetry(rng)
+        if args.packed:
+            messages = [packed_message(telemetry, asset_id, client_id=client_id)]
+        else:
+            messages = attribute_messages(telemetry, asset_id, client_id=client_id)
+        for topic, payload in messages:
+            start = time.perf_counter()
+            info = client.publish(topic, payload, qos=args.qos)
+            tracker.sent(info.mid, start)
+        next_at += interval
+
+
+async def run(args):
+    trackers = []
+    clients = []
+    client_ids = [f"{args.client_prefix}-{i}" for i in range(args.connections)]
+    for client_id in client_ids:
+        client = make_client(client_id, tls=not args.no_tls,
+                             username=None if args.anonymous else args.username, password=args.password)
+        tracker = AckTracker()
+        client.on_publish = tracker.on_publish
+        client.max_inflight_messages_set(args.max_inflight)
+        client.max_queued_messages_set(0)  # File d'envoi de paho illimitée : le débit atteint est mesuré, pas imposé
+        client.connect(args.broker, args.port, keepalive=60)
+        client.loop_start()
+        trackers.append(tracker)
+        clients.append(client)
+    deadline = time.monotonic() + 10
+    while not all(client.is_connected() for client in clients):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Connexion impossible au broker {args.broker}:{args.port}")
+        await asyncio.sleep(0.05)
+
+    rng = random.Random(args.seed)
+    tasks = []
+    for index in range(args.devices):
+        interval = args.interval * rng.uniform(1 - args.jitter, 1 + args.jitter)
+        connection = index % args.connections
+        tasks.append(asyncio.create_task(
+            collar(index, clients[connection], client_ids[connection], trackers[connection], interval, args,
+                   random.Random(rng.random()))
+        ))
+    messages_per_record = 1 if args.packed else len(attribute_messages(generate_telemetry(rng)))
+    print(f"{args.devices} colliers, {args.connections} connexions, QoS {args.qos}, "
+          f"{'JSON groupé' if args.packed else 'un message par attribut'} : "
+          f"~{args.devices * messages_per_record / args.interval:.0f} messages/s attendus")
+
+    start = time.perf_counter()
+    last = start, 0, 0
+    try:
+        while time.perf_counter() - start < args.duration:
+            await asyncio.sleep(min(args.report_every, max(0.0, args.duration - (time.perf_counter() - start))))
+            now = time.perf_counter()
+            published = sum(tracker.published for tracker in trackers)
+            acked = sum(tracker.acked for tracker in trackers)
+            window = [latency for tracker in trackers for latency in tracker.take_window()]
+            span = now - last[0]
+            print(f"[{now - start:6.1f} s] publiés {(published - last[1]) / span:8.1f} msg/s | "
+                  f"acquittés {(acked - last[2]) / span:8.1f} msg/s | en vol {published - acked:6d} | "
+                  + summarize("latence", window))
+            last = now, published, acked
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    drain_deadline = time.monotonic() + args.drain
+    while sum(len(tracker.inflight) for tracker in trackers) and time.monotonic() < drain_deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.loop_stop()
+        client.disconnect()
+
+    published = sum(tracker.published for tracker in trackers)
+    acked = sum(tracker.acked for tracker in trackers)
+    latencies = [latency for tracker in trackers for latency in tracker.latencies]
+    print(f"\n{published} messages publiés en {elapsed:.1f} s ({published / elapsed:.1f} msg/s), "
+          f"{acked} acquittés, {published - acked} sans acquittement")
+    print(summarize("publication -> ack", latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000, help="Colliers simulés")
+    parser.add_argument("--interval", type=float, default=10.0, help="Intervalle moyen entre deux relevés (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Dispersion des cadences par collier (±fraction)")
+    parser.add_argument("--packed", action="store_true", help="Un message JSON par relevé au lieu d'un par attribut")
+    parser.add_argument("--qos", type=int, choices=(0, 1, 2), default=1)
+    parser.add_argument("--connections", type=int, default=8, help="Connexions MQTT partagées par les colliers")
+    parser.add_argument("--max-inflight", type=int, default=1000, help="Messages QoS>0 non acquittés par connexion")
+    parser.add_argument("--duration", type=float, default=60.0, help="Durée de l'essai (s)")
+    parser.add_argument("--report-every", type=float, default=5.0)
+    parser.add_argument("--drain", type=float, default=5.0, help="Attente des derniers acquittements (s)")
+    parser.add_argument("--broker", default=MQTT_BROKER)
+    parser.add_argument("--port", type=int, default=MQTT_PORT)
+    parser.add_argument("--no-tls", action="store_true")
+    parser.add_argument("--username", default=USERNAME)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--anonymous", action="store_true", help="Connexion sans authentification")
+    parser.add_argument("--client-prefix", default="herd_load")
+    parser.add_argument("--embedded-broker", action="store_true",
+                        help="Démarre un broker amqtt local sur --port (essai sans OpenRemote, même processus)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.embedded_broker:
+        from mqtt_ingest import start_embedded_broker
+
+        start_embedded_broker(port=args.port)
+        args.broker = "127.0.0.1"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
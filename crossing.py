@@ -0,0 +1,68 @@
+import numpy as np
+
+
+def _orient(p, q, r):
+    """Produit vectoriel (q - p) x (r - p) : signe de l'orientation du triplet, diffusé sur les axes de tête."""
+    return (q[..., 0] - p[..., 0]) * (r[..., 1] - p[..., 1]) - (q[..., 1] - p[..., 1]) * (r[..., 0] - p[..., 0])
+
+
+def _in_bounds(p, q, r):
+    """Vrai si r est dans la boîte englobante du segment [p, q] (r étant supposé colinéaire à pq)."""
+    return (
+        (np.minimum(p[..., 0], q[..., 0]) <= r[..., 0])
+        & (r[..., 0] <= np.maximum(p[..., 0], q[..., 0]))
+        & (np.minimum(p[..., 1], q[..., 1]) <= r[..., 1])
+        & (r[..., 1] <= np.maximum(p[..., 1], q[..., 1]))
+    )
+
+
+def segments_intersect(a1, a2, b1, b2):
+    """
+    Teste l'intersection des segments fermés [a1, a2] et [b1, b2], comme LineString.intersects de shapely.
+
+    Args:
+        a1, a2 (np.ndarray): Extrémités des N segments testés, de forme (N, 2).
+        b1, b2 (np.ndarray): Extrémités du segment de référence, de forme (2,).
+
+    Returns:
+        (np.ndarray): Masque booléen de forme (N,), contact aux extrémités compris. Comme shapely, un segment
+            de longueur nulle (objet immobile) n'intersecte rien.
+    """
+    d1 = _orient(b1, b2, a1)
+    d2 = _orient(b1, b2, a2)
+    d3 = _orient(a1, a2, b1)
+    d4 = _orient(a1, a2, b2)
+    proper = (((d1 > 0) & (d2 < 0)) | ((d1 < 0) & (d2 > 0))) & (((d3 > 0) & (d4 < 0)) | ((d3 < 0) & (d4 > 0)))
+    touching = (
+        ((d1 == 0) & _in_bounds(b1, b2, a1))
+        | ((d2 == 0) & _in_bounds(b1, b2, a2))
+        | ((d3 == 0) & _in_bounds(a1, a2, b1))
+        | ((d4 == 0) & _in_bounds(a1, a2, b2))
+    )
+    moved = (a1 != a2).any(axis=-1)
+    return (proper | touching) & moved
+
+
+def points_in_polygon(points, polygon):
+    """
+    Teste l'appartenance stricte de N points à un polygone, comme Polygon.contains de shapely.
+
+    Args:
+        points (np.ndarray): Points testés, de forme (N, 2).
+        polygon (np.ndarray): Sommets du polygone, de forme (M, 2).
+
+    Returns:
+        (np.ndarray): Masque booléen de forme (N,) ; un point situé sur le bord n'est pas contenu.
+    """
+    p = points[:, None, :]
+    start = polygon[None, :, :]
+    end = np.roll(polygon, -1, axis=0)[None, :, :]
+
+    x, y = p[..., 0], p[..., 1]
+    x1, y1, x2, y2 = start[..., 0], start[..., 1], end[..., 0], end[..., 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crosses = ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+    inside = crosses.sum(axis=1) % 2 == 1
+
+    on_edge = ((_orient(start, end, p) == 0) & _in_bounds(start, end, p)).any(axis=1)
+    return inside & ~on_edge
@@ -1,9 +1,9 @@
-import paho.mqtt.client as mqtt
-import ssl
 import json
 import random
 import time
 
+from publisher import make_client as make_mqtt_client
+
 # === CONFIGURATION TLS ===
 MQTT_BROKER    = "localhost"
 MQTT_PORT      = 8883               # port TLS exposé par le proxy OpenRemote
@@ -16,34 +16,11 @@ ASSET_ID       = "6BzWmbabR4gC0OEFARNHB3"
 USERNAME = f"{REALM}:{SERVICE_USER}"
 PASSWORD = SERVICE_SECRET
 
-# Callback connexion
-def on_connect(client, userdata, flags, rc):
-    if rc == 0:
-        print("✅ Connecté avec succès au broker MQTT TLS")
-    else:
-        print("❌ Erreur de connexion TLS, code:", rc)
-
-# Initialisation du client MQTT
-client = mqtt.Client(client_id=CLIENT_ID)
-
-# --- Activation de TLS ---
-client.tls_set(
-    ca_certs=None,            # CA système par défaut
-    certfile=None,
-    keyfile=None,
-    cert_reqs=ssl.CERT_NONE,  # ne vérifie pas le certificat (self‑signed)
-    tls_version=ssl.PROTOCOL_TLS,
-    ciphers=None
-)
-client.tls_insecure_set(True)  # autorise les certificats invalides
-
-# Authentification
-client.username_pw_set(USERNAME, PASSWORD)
-client.on_connect = on_connect
-
-# Connexion au broker TLS
-client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
-client.loop_start()
+PACKED_ATTRIBUTE = "telemetry"  # Attribut recevant l'enregistrement complet en un seul message JSON
+
+def make_client(client_id=CLIENT_ID, tls=True, username=USERNAME, password=PASSWORD):
+    """Crée un client MQTT du simulateur (TLS, authentification), pas encore connecté (cf. publisher.make_client)."""
+    return make_mqtt_client(client_id, tls=tls, username=username, password=password)
 
 # Simulation des données terrain
 cities = {
@@ -53,40 +30,64 @@ cities = {
     "Paris":        {"lat": 48.8566, "lon":   2.3522}
 }
 
-try:
-    while True:
-        # Génération de valeurs aléatoires
-        telemetry = {
-            "temperature": round(random.uniform(20.0, 30.0), 1),
-            "age":         random.randint(1, 10),
-            "poids":       round(random.uniform(40.0, 400.0), 1),
-            "active":      random.choice([True, False]),
-            "time":        int(time.time()),
-        }
-        city, coords = random.choice(list(cities.items()))
-        telemetry["gps_city"] = city
-        telemetry["gps_lat"]  = coords["lat"]
-        telemetry["gps_lon"]  = coords["lon"]
-
-        # Publication des attributs classiques
-        for attr, value in telemetry.items():
-            topic = f"{REALM}/{CLIENT_ID}/writeattributevalue/{attr}/{ASSET_ID}"
-            payload = json.dumps(value) if isinstance(value, str) else value
-            client.publish(topic, payload)
-            print(f"Publié {attr}={value} sur {topic}")
-
-        # Publication GeoJSON pour la carte
-        geojson_point = {
-            "type": "Point",
-            "coordinates": [telemetry["gps_lon"], telemetry["gps_lat"]]
-        }
-        location_topic = f"{REALM}/{CLIENT_ID}/writeattributevalue/location/{ASSET_ID}"
-        client.publish(location_topic, json.dumps(geojson_point))
-        print(f"Publié location={geojson_point} sur {location_topic}")
-
-        time.sleep(10)
-
-except KeyboardInterrupt:
-    print("Arrêt de la simulation...")
-    client.loop_stop()
-    client.disconnect()
+def generate_telemetry(rng=random):
+    """Génère un relevé aléatoire d'un collier (valeurs terrain et position GPS)."""
+    telemetry = {
+        "temperature": round(rng.uniform(20.0, 30.0), 1),
+        "age":         rng.randint(1, 10),
+        "poids":       round(rng.uniform(40.0, 400.0), 1),
+        "active":      rng.choice([True, False]),
+        "time":        int(time.time()),
+    }
+    city, coords = rng.choice(list(cities.items()))
+    telemetry["gps_city"] = city
+    telemetry["gps_lat"]  = coords["lat"]
+    telemetry["gps_lon"]  = coords["lon"]
+    return telemetry
+
+def attribute_topic(attr, asset_id=ASSET_ID, client_id=CLIENT_ID):
+    return f"{REALM}/{client_id}/writeattributevalue/{attr}/{asset_id}"
+
+def location(telemetry):
+    """Position GeoJSON du relevé, pour la carte."""
+    return {
+        "type": "Point",
+        "coordinates": [telemetry["gps_lon"], telemetry["gps_lat"]]
+    }
+
+def attribute_messages(telemetry, asset_id=ASSET_ID, client_id=CLIENT_ID):
+    """Un message (topic, payload) par attribut, puis la position GeoJSON : le format historique."""
+    messages = []
+    for attr, value in telemetry.items():
+        payload = json.dumps(value) if isinstance(value, str) else value
+        messages.append((attribute_topic(attr, asset_id, client_id), payload))
+    messages.append((attribute_topic("location", asset_id, client_id), json.dumps(location(telemetry))))
+    return messages
+
+def packed_message(telemetry, asset_id=ASSET_ID, client_id=CLIENT_ID):
+    """Tout le relevé (position comprise) dans un seul message JSON, publié sur l'attribut PACKED_ATTRIBUTE."""
+    payload = dict(telemetry, location=location(telemetry))
+    return attribute_topic(PACKED_ATTRIBUTE, asset_id, client_id), json.dumps(payload)
+
+if __name__ == "__main__":
+    # Initialisation du client MQTT et connexion au broker TLS
+    client = make_client()
+    client.connect(MQTT_BROKER, MQTT_PORT, keepalive=60)
+    client.loop_start()
+
+    try:
+        while True:
+            # Génération de valeurs aléatoires
+            telemetry = generate_telemetry()
+
+            # Publication des attributs classiques puis de la position GeoJSON pour la carte
+            for topic, payload in attribute_messages(telemetry):
+                client.publish(topic, payload)
+                print(f"Publié {payload} sur {topic}")
+
+            time.sleep(10)
+
+    except KeyboardInterrupt:
+        print("Arrêt de la simulation...")
+        client.loop_stop()
+        client.disconnect()
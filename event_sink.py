@@ -0,0 +1,164 @@
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+_CLOSE = object()  # Sentinelle de fermeture du thread d'écriture
+
+FIELDS = ["track_id", "label", "date", "time"]
+
+
+class _CsvWriter:
+    """Écrit les événements dans un CSV par jour, en gardant le fichier du jour ouvert."""
+
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.date = None
+        self.file = None
+        self.writer = None
+
+    def _open(self, date):
+        self.close()
+        filename = os.path.join(self.directory, f"{self.prefix}_{date}.csv")
+        file_exists = os.path.isfile(filename)  # Un seul stat par rotation, pas par écriture
+        self.file = open(filename, mode="a", newline="")
+        self.writer = csv.writer(self.file)
+        if not file_exists:
+            self.writer.writerow(FIELDS)
+        self.date = date
+
+    def write(self, date, rows):
+        if date != self.date:
+            self._open(date)
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = self.writer = None
+            self.date = None
+
+
+class _ParquetWriter:
+    """Écrit les événements en Parquet : un fichier par jour et par exécution, un row group par vidage."""
+
+    def __init__(self, directory, prefix):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Le format 'parquet' nécessite pyarrow (pip install pyarrow)") from e
+        self.pa, self.pq = pa, pq
+        self.schema = pa.schema([
+            ("track_id", pa.int64()), ("label", pa.string()), ("date", pa.string()), ("time", pa.string()),
+        ])
+        self.directory = directory
+        self.prefix = prefix
+        self.run_stamp = datetime.now().strftime("%H%M%S")  # Parquet ne permet pas l'ajout à un fichier existant
+        self.date = None
+        self.writer = None
+
+    def write(self, date, rows):
+        if date != self.date:
+            self.close()
+            filename = os.path.join(self.directory, f"{self.prefix}_{date}_{self.run_stamp}.parquet")
+            self.writer = self.pq.ParquetWriter(filename, self.schema)
+            self.date = date
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.date = None
+
+
+class EventSink:
+    """
+    Puits d'événements de comptage asynchrone.
+
+    emit() ne fait que déposer l'événement dans une file : un thread dédié regroupe les événements et les
+    écrit par lots dès que batch_size événements sont en attente ou que flush_interval secondes se sont
+    écoulées. Les fichiers changent de nom avec la date de l'événement.
+    """
+
+    WRITERS = {"csv": _CsvWriter, "parquet": _ParquetWriter}
+
+    def __init__(self, directory=".", prefix="tracked_objects", fmt="csv", batch_size=64, flush_interval=2.0):
+        """
+        Args:
+            directory (str): Dossier de sortie (créé si besoin).
+            prefix (str): Préfixe des fichiers, suivi de la date du jour.
+            fmt (str): "csv" (compatible avec les fichiers existants) ou "parquet" (colonnes, nécessite pyarrow).
+            batch_size (int): Nombre d'événements déclenchant un vidage.
+            flush_interval (float): Délai maximal en secondes avant qu'un événement soit écrit.
+        """
+        if fmt not in self.WRITERS:
+            raise ValueError(f"Format inconnu : {fmt!r} (attendu : {', '.join(self.WRITERS)})")
+        os.makedirs(directory, exist_ok=True)
+        self.writer = self.WRITERS[fmt](directory, prefix)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0  # Nombre d'événements écrits sur disque
+        self.error = None
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def emit(self, track_id, label, timestamp=None):
+        """Enregistre un événement sans bloquer l'appelant."""
+        timestamp = timestamp or datetime.now()
+        self._queue.put((track_id, label, timestamp))
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _CLOSE:
+                break
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+        self._flush(batch)
+        self.writer.close()
+
+    def _flush(self, batch):
+        """Écrit un lot d'événements, regroupés par date."""
+        by_date = {}
+        for track_id, label, timestamp in batch:
+            date = timestamp.strftime("%Y-%m-%d")
+            by_date.setdefault(date, []).append([track_id, label, date, timestamp.strftime("%H:%M:%S")])
+        for date, rows in by_date.items():
+            try:
+                self.writer.write(date, rows)
+                self.written += len(rows)
+            except OSError as e:  # On garde le thread en vie : une erreur disque ne doit pas arrêter le comptage
+                self.error = e
+                print(f"Erreur d'écriture des événements : {e}")
+
+    def close(self):
+        """Vide les événements en attente, ferme les fichiers et arrête le thread d'écriture."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_CLOSE)
+        self._thread.join()
+        atexit.unregister(self.close)
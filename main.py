@@ -1,13 +1,17 @@
-import cv2
+from metrics import Metrics
+from motion_gate import AdaptiveRatePolicy, MotionGate
+from openremote import MQTT_BROKER, MQTT_PORT, PASSWORD, REALM, USERNAME
+from pipeline import PipelineRunner
+from publisher import Publisher
 from tracker1 import ObjectCounter  # Importing ObjectCounter from tracker.py
 
 video_path=['cattlecount.mp4','vid.mp4']
-# Open the video file
-cap = cv2.VideoCapture(video_path[0])
-
 # Define region points for counting
 region_points = [(569, 5), (569, 499)]
 
+# True sur les machines sans écran : suivi et comptage seulement, sans annotation ni affichage
+HEADLESS = False
+
 # Initialize the object counter
 counter = ObjectCounter(
     region=region_points,  # Pass region points
@@ -15,35 +19,45 @@ counter = ObjectCounter(
     show_in=True,  # Display in counts
     show_out=True,  # Display out counts
     line_width=2,  # Adjust line width for display
+    headless=HEADLESS,  # Skip annotation and display
+    snapshot_interval=60 if HEADLESS else 0,  # Annotated debug snapshot every minute when headless
+    roi_inference=False,  # True: detect only in a band around the counting line (smaller input tensor on CPU)
+    roi_margin=80,  # Band half-width in pixels around the region
+    full_frame_interval=30,  # With roi_inference, one full-frame pass every 30 frames keeps track IDs stable
 )
 
-count = 0
-
-while True:
-    # Read a frame from the video
-    ret, frame = cap.read()
-    if not ret:
-        # If video ends, reset to the beginning
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        continue
-    count += 1
-    if count % 2 != 0:  # Skip odd frames
-        continue
-
-    frame = cv2.resize(frame, (1020, 500))
-
-    # Process the frame with the object counter
-    frame = counter.count(frame)
-    
-
-    # Show the frame
-    cv2.imshow("FRAME", frame)
-    if cv2.waitKey(1) & 0xFF == ord("q"):  # Small delay to visualize the frame
-        break
-    
+# Franchissements IN/OUT et bilan de fin de flux publiés vers OpenRemote sur une connexion persistante ;
+# liaison coupée, ils sont conservés dans mqtt_spool/counter et rejoués au retour du réseau
+COUNTER_ASSET_ID = "2AMcEvCgIAahRe835h31dZ"  # Remplacez par l'ID de l'asset OpenRemote du compteur
+publisher = Publisher(
+    MQTT_BROKER, MQTT_PORT, "cattle_counter",
+    username=USERNAME, password=PASSWORD,
+    realm=REALM, asset_id=COUNTER_ASSET_ID,
+    spool_dir="mqtt_spool/counter",
+)
+counter.publisher = publisher
+
+# Latences par étage, FPS et profondeur des files sur http://127.0.0.1:9100/metrics (format Prometheus)
+metrics = Metrics(enabled=True)
+metrics.serve(port=9100)
+
+# Pipeline capture → redimensionnement → comptage → affichage en threads parallèles.
+# Politique des files choisie selon la source : "block" sur fichier (aucune image perdue, comptages
+# reproductibles), "drop_oldest" sur caméra en direct pour ne pas accumuler de retard.
+runner = PipelineRunner(
+    video_path[0],
+    counter,
+    size=(1020, 500),
+    frame_step=1,  # Toutes les images sont décodées, le filtre de mouvement choisit celles à traiter
+    queue_size=4,
+    loop=True,  # Relit la vidéo depuis le début en fin de fichier
+    headless=HEADLESS,
+    metrics=metrics,
+    # Cadence réduite (1 image sur 10) sur pâture vide, pleine cadence dès qu'un mouvement approche de la ligne
+    gate=MotionGate(region_points, policy=AdaptiveRatePolicy(idle_step=10, active_step=1)),
+)
+runner.run()
+print(runner.report())
 
-# Release the video capture object and close the display window
-cap.release()
-cv2.destroyAllWindows()
 counter.finalize()
- 
\ No newline at end of file
+publisher.close()
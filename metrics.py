@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+PREFIX = "cattle"
+
+
+class _NullTimer:
+    """Chronomètre inactif renvoyé quand les métriques sont désactivées (aucun appel d'horloge)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.histogram.observe(end - self.start, end)
+        return False
+
+
+class RollingHistogram:
+    """Durées des window dernières observations d'un étage, plus les totaux depuis le démarrage."""
+
+    def __init__(self, window=2048):
+        self.samples = deque(maxlen=window)  # (instant de fin, durée)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, end=None):
+        with self._lock:
+            self.samples.append((end if end is not None else time.perf_counter(), seconds))
+            self.count += 1
+            self.total += seconds
+
+    def summary(self):
+        """p50/p95/p99 (secondes) et débit sur la fenêtre glissante."""
+        with self._lock:
+            samples = list(self.samples)
+            count, total = self.count, self.total
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "fps": 0.0, "count": count, "sum": total}
+        p50, p95, p99 = np.percentile([duration for _, duration in samples], [50, 95, 99]).tolist()
+        span = samples[-1][0] - samples[0][0]
+        fps = (len(samples) - 1) / span if span > 0 else 0.0
+        return {"p50": p50, "p95": p95, "p99": p99, "fps": fps, "count": count, "sum": total}
+
+
+class Metrics:
+    """
+    Instrumentation des étages du pipeline vidéo : histogrammes glissants, jauges et compteurs.
+
+    Désactivée (enabled=False), timer() renvoie un chronomètre vide partagé et les autres méthodes ne font
+    rien : le coût se limite à un appel de méthode. Les métriques sont exposées en texte Prometheus et en
+    JSON par un petit serveur HTTP local (serve) ou écrites périodiquement dans un fichier (dump_every).
+    """
+
+    def __init__(self, enabled=True, window=2048):
+        self.enabled = enabled
+        self.window = window
+        self.histograms = {}
+        self.gauges = {}  # (nom, labels) -> fonction appelée au moment de la lecture
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _histogram(self, stage):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, RollingHistogram(self.window))
+        return histogram
+
+    def timer(self, stage):
+        """Context manager mesurant la durée d'un étage."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self._histogram(stage))
+
+    def observe(self, stage, seconds):
+        """Enregistre une durée mesurée par ailleurs."""
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def inc(self, name, n=1):
+        """Incrémente un compteur."""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, fn, **labels):
+        """Déclare une jauge dont la valeur est lue par fn() à chaque export (profondeur de file, comptages...)."""
+        if self.enabled:
+            self.gauges[(name, tuple(sorted(labels.items())))] = fn
+
+    def snapshot(self):
+        """État courant de toutes les métriques, sous forme de dictionnaire sérialisable."""
+        return {
+            "timestamp": time.time(),
+            "stages": {stage: histogram.summary() for stage, histogram in list(self.histograms.items())},
+            "gauges": [{"name": name, "labels": dict(labels), "value": fn()} for (name, labels), fn in
+                       list(self.gauges.items())],
+            "counters": dict(self.counters),
+        }
+
+    def prometheus(self):
+        """Export au format texte Prometheus."""
+        snapshot = self.snapshot()
+        lines = [f"# TYPE {PREFIX}_stage_latency_seconds summary"]
+        for stage, summary in snapshot["stages"].items():
+            for quantile in ("p50", "p95", "p99"):
+                q = int(quantile[1:]) / 100
+                lines.append(f'{PREFIX}_stage_latency_seconds{{stage="{stage}",quantile="{q}"}} {summary[quantile]:.6f}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_count{{stage="{stage}"}} {summary["count"]}')
+            lines.append(f'{PREFIX}_stage_latency_seconds_sum{{stage="{stage}"}} {summary["sum"]:.6f}')
+        lines.append(f"# TYPE {PREFIX}_stage_fps gauge")
+        for stage, summary in snapshot["stages"].items():
+            lines.append(f'{PREFIX}_stage_fps{{stage="{stage}"}} {summary["fps"]:.3f}')
+        for gauge in snapshot["gauges"]:
+            labels = ",".join(f'{k}="{v}"' for k, v in gauge["labels"].items())
+            lines.append(f"{PREFIX}_{gauge['name']}{{{labels}}} {gauge['value']}")
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{PREFIX}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """Expose /metrics (Prometheus) et /metrics.json sur un serveur HTTP local, dans un thread dédié."""
+        if not self.enabled or self._server is not None:
+            return
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(metrics.snapshot()), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass  # Pas de journal par requête
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def dump_every(self, path, interval=10.0):
+        """Écrit l'instantané JSON dans path toutes les interval secondes, dans un thread dédié."""
+        if not self.enabled:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                with open(path, "w") as file:
+                    json.dump(self.snapshot(), file)
+
+        threading.Thread(target=loop, name="metrics-dump", daemon=True).start()
+
+    def close(self):
+        """Arrête le serveur HTTP s'il a été démarré."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+NULL_METRICS = Metrics(enabled=False)  # Instance par défaut : instrumentation désactivée
@@ -0,0 +1,39 @@
+"""
+Migration ponctuelle de telemetry_data vers la clé primaire (id, time).
+
+Les services (mqtt_client.py, mqtt_ingest.py) refusent de démarrer tant que la table a l'ancienne clé
+(time). Sans option, le script affiche seulement le bilan : clé actuelle, nombre de lignes et nombre de
+lignes sans id. Avec --apply, il migre en une transaction ; les lignes sans id, qui ne peuvent pas entrer
+dans la nouvelle clé, sont d'abord copiées dans telemetry_data_null_id.
+
+Usage :
+    python migrate_telemetry.py            # aperçu, aucune modification
+    python migrate_telemetry.py --apply
+"""
+
+import argparse
+
+import psycopg2
+
+from mqtt_client import PG_SETTINGS, migrate_primary_key
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="Effectue la migration (par défaut : aperçu seulement)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**PG_SETTINGS)
+    try:
+        report = migrate_primary_key(conn, apply=args.apply)
+    finally:
+        conn.close()
+
+    print(f"Clé primaire : {report['primary_key']} | lignes : {report['rows']} | sans id : {report['null_id_rows']}")
+    if report["primary_key"] == ["id", "time"]:
+        print("Déjà migrée, rien à faire.")
+    elif report["migrated"]:
+        print(f"Migrée vers (id, time) ; {report['null_id_rows']} lignes sans id copiées dans telemetry_data_null_id "
+              "puis retirées de telemetry_data.")
+    else:
+        print(f"Aperçu : --apply copiera {report['null_id_rows']} lignes sans id dans telemetry_data_null_id, les "
+              "retirera de telemetry_data puis créera la clé (id, time).")
@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+
+class FixedStridePolicy:
+    """Politique historique : traite une image sur step, quel que soit le mouvement."""
+
+    def __init__(self, step=2):
+        self.step = step
+        self._index = 0
+
+    def decide(self, motion):
+        self._index += 1
+        return self._index % self.step == 0
+
+
+class AdaptiveRatePolicy:
+    """
+    Politique adaptative : cadence réduite quand la scène est immobile, pleine cadence dès qu'un mouvement
+    apparaît près de la région de comptage, maintenue pendant hold images après le dernier mouvement.
+    """
+
+    def __init__(self, idle_step=10, active_step=1, threshold=0.002, hold=15):
+        """
+        Args:
+            idle_step (int): Traite une image sur idle_step quand rien ne bouge (garde le tracker à jour).
+            active_step (int): Traite une image sur active_step pendant un mouvement.
+            threshold (float): Fraction de pixels modifiés au-delà de laquelle la scène est considérée en mouvement.
+            hold (int): Nombre d'images pendant lesquelles la pleine cadence est maintenue après un mouvement.
+        """
+        self.idle_step = idle_step
+        self.active_step = active_step
+        self.threshold = threshold
+        self.hold = hold
+        self._active_left = 0
+        self._index = 0
+
+    def decide(self, motion):
+        self._index += 1
+        if motion >= self.threshold:
+            self._active_left = self.hold
+        elif self._active_left > 0:
+            self._active_left -= 1
+        step = self.active_step if self._active_left > 0 else self.idle_step
+        return self._index % step == 0
+
+
+class MotionGate:
+    """
+    Décide, pour chaque image, si l'inférence doit tourner.
+
+    Le mouvement est mesuré par différence d'images en niveaux de gris, sous-échantillonnées, sur la seule
+    zone entourant la région de comptage. La décision est déléguée à une politique interchangeable
+    (tout objet exposant decide(motion) -> bool).
+    """
+
+    def __init__(self, region, policy=None, margin=80, scale=0.25, pixel_threshold=25):
+        """
+        Args:
+            region (list): Points de la région de comptage, dans le repère des images reçues.
+            policy: Politique de décision (AdaptiveRatePolicy par défaut).
+            margin (int): Marge en pixels autour de la région dans laquelle le mouvement est surveillé.
+            scale (float): Facteur de sous-échantillonnage appliqué avant la différence d'images.
+            pixel_threshold (int): Écart de niveau de gris à partir duquel un pixel est considéré modifié.
+        """
+        self.policy = policy or AdaptiveRatePolicy()
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        points = np.asarray(region)
+        self.x0, self.y0 = (points.min(axis=0) - margin).clip(min=0).astype(int)
+        self.x1, self.y1 = (points.max(axis=0) + margin).astype(int)
+        self._previous = None
+        self.processed = 0
+        self.skipped = 0
+        self.last_motion = 0.0
+
+    def motion(self, frame):
+        """Fraction des pixels de la zone surveillée qui ont changé depuis l'image précédente."""
+        roi = frame[self.y0:self.y1, self.x0:self.x1]
+        small = cv2.resize(roi, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, gray
+        if previous is None:
+            return 1.0  # Première image : on la traite
+        changed = cv2.absdiff(gray, previous) > self.pixel_threshold
+        return float(np.count_nonzero(changed)) / changed.size
+
+    def should_process(self, frame):
+        """Mesure le mouvement de l'image et indique si elle doit passer par le suivi et le comptage."""
+        self.last_motion = self.motion(frame)
+        process = self.policy.decide(self.last_motion)
+        if process:
+            self.processed += 1
+        else:
+            self.skipped += 1
+        return process
+
+    def stats(self):
+        """Nombre d'images traitées et ignorées depuis le démarrage."""
+        total = self.processed + self.skipped
+        return {
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "processed_ratio": self.processed / total if total else 0.0,
+            "last_motion": self.last_motion,
+        }
@@ -1,15 +1,45 @@
-import requests
+import asyncio
+import csv
+import io
+import os
 import time
 import json
-from fastapi import FastAPI, HTTPException
-import psycopg2
+from collections import defaultdict
+from contextlib import asynccontextmanager
+import httpx
+from fastapi import FastAPI, HTTPException, Query
+from psycopg2.pool import ThreadedConnectionPool
+import numpy as np
 import pandas as pd  # Utilisé pour le prétraitement et la normalisation
 import uvicorn
-app = FastAPI(title="Data Collection Service")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ressources partagées par toutes les requêtes, créées une seule fois au démarrage du service :
+    client HTTP keep-alive vers ThingsBoard, pool borné de connexions PostgreSQL et schéma.
+    """
+    app.state.http = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT_S,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)
+    )
+    app.state.pg_pool = ThreadedConnectionPool(PG_POOL_MIN, PG_POOL_MAX, **PG_SETTINGS)
+    # ThreadedConnectionPool lève une erreur quand il est épuisé : le sémaphore fait attendre les requêtes à la place
+    app.state.pg_slots = asyncio.Semaphore(PG_POOL_MAX)
+    try:
+        await run_db(create_table_if_not_exists)
+        yield
+    finally:
+        await app.state.http.aclose()
+        app.state.pg_pool.closeall()
+
+app = FastAPI(title="Data Collection Service", lifespan=lifespan)
 
 # === Configuration de l'API REST ThingsBoard ===
-THINGSBOARD_API_URL = "https://demo.thingsboard.io/api/plugins/telemetry/DEVICE"
+# Surchargeable par variable d'environnement (serveur ThingsBoard simulé pour les tests de charge)
+THINGSBOARD_API_URL = os.environ.get("THINGSBOARD_API_URL", "https://demo.thingsboard.io/api/plugins/telemetry/DEVICE")
 DEVICE_ID = "7c33fa90-dfe9-11ef-9dbc-834dadad7dd9"  # Remplacez par l'ID réel de votre device
+DEVICE_IDS = [DEVICE_ID]  # Devices synchronisés par /fetch_and_store (un par troupeau)
 JWT_TOKEN = ("Bearer eyJhbGciOiJIUzUxMiJ9.eyJzdWIiOiJmb2ZhbmFib3VuYW"
              "1hNzZAZ21haWwuY29tIiwidXNlcklkIjoiNzUyYWQ0ZDAtZGZlOS0xMWVmLTlk"
              "YmMtODM0ZGFkYWQ3ZGQ5Iiwic2NvcGVzIjpbIlRFTkFOVF9BRE1JTiJdLCJzZX"
@@ -21,9 +51,24 @@ JWT_TOKEN = ("Bearer eyJhbGciOiJIUzUxMiJ9.eyJzdWIiOiJmb2ZhbmFib3VuYW"
              "OWRiYy04MzRkYWRhZDdkZDkiLCJjdXN0b21lcklkIjoiMTM4MTQwMDAtMWRkMi0x"
              "MWIyLTgwODAtODA4MDgwODA4MDgwIn0.93Q3me8u3yB1llDUi3tH3qKENbqM7Tvriu6lnEYcmjbIDTv1ufhhx-qS5KlnptK89lkidLjiUv2-aEJtlmVn2A")
 
-def get_telemetry(device_id: str, start_ts: int, end_ts: int, jwt_token: str):
+# === Synchronisation incrémentale ===
+INITIAL_LOOKBACK_MS = 60 * 60 * 1000  # Premier passage d'un device : dernière heure
+SYNC_CHUNK_MS = 60 * 60 * 1000  # Un long retard est rattrapé par tranches d'une heure
+# Marge de relecture : une mesure LoRa peut arriver sur ThingsBoard plusieurs minutes après son horodatage.
+# Le point de reprise reste SYNC_SAFETY_LAG_MS en deçà de la fin de la synchronisation, la marge est donc
+# relue au passage suivant (l'upsert sur (id, time) absorbe les doublons).
+SYNC_SAFETY_LAG_MS = 10 * 60 * 1000
+TELEMETRY_PAGE_LIMIT = 10000  # Nombre maximal de points par clé renvoyés par requête ThingsBoard
+MAX_PARALLEL_FETCHES = 4  # Devices interrogés simultanément
+
+# === Client HTTP ===
+HTTP_TIMEOUT_S = 30.0
+HTTP_MAX_CONNECTIONS = 16  # Connexions keep-alive réutilisées d'une requête à l'autre (pas de nouvelle poignée de main TLS)
+
+async def get_telemetry(client: httpx.AsyncClient, device_id: str, start_ts: int, end_ts: int, jwt_token: str,
+                        limit: int = TELEMETRY_PAGE_LIMIT):
     """
-    Interroge l'API REST de ThingsBoard pour récupérer la télémétrie.
+    Interroge l'API REST de ThingsBoard pour récupérer la télémétrie, via le client HTTP partagé.
     La réponse est attendue sous forme d'un dictionnaire où chaque clé correspond à un champ 
     (par ex. "temperature", "humidity", etc.) et la valeur est une liste de dictionnaires 
     contenant "ts" (timestamp) et "value".
@@ -32,19 +77,99 @@ def get_telemetry(device_id: str, start_ts: int, end_ts: int, jwt_token: str):
     params = {
         "keys": "id,temperature,age,poids,active",  # Les champs attendus
         "startTs": start_ts,
-        "endTs": end_ts
+        "endTs": end_ts,
+        "limit": limit  # ThingsBoard renvoie 100 points par défaut
     }
     headers = {
         "Content-Type": "application/json",
         "X-Authorization": jwt_token
     }
-    response = requests.get(url, params=params, headers=headers)
+    response = await client.get(url, params=params, headers=headers)
     if response.status_code != 200:
         raise HTTPException(status_code=response.status_code, detail="Erreur lors de la récupération des données de ThingsBoard")
     return response.json()
 
+TELEMETRY_KEYS = ["temperature", "id", "age", "poids", "active"]
+TELEMETRY_COLUMNS = ["time", "temperature", "id", "age", "poids", "active"]
+
+def pivot_telemetry(data: dict):
+    """
+    Pivote la réponse de ThingsBoard en colonnes typées, en une seule passe sur chaque clé.
+
+    Les timestamps entiers de la première clé servent de référence ; chaque autre clé est triée une fois puis
+    alignée par recherche dichotomique. Seuls les timestamps présents pour toutes les clés sont conservés
+    (intersection), dans l'ordre de la première clé, comme avec les fusions internes successives.
+
+    Renvoie un dictionnaire de tableaux NumPy (time, temperature, id, age, poids, active), prêt à être écrit
+    en base sans passer par des dictionnaires par ligne, ou None si une clé contient des timestamps en double.
+    """
+    series = {}
+    for key in TELEMETRY_KEYS:
+        points = data.get(key) or []
+        ts = np.fromiter((point["ts"] for point in points), dtype=np.int64, count=len(points))
+        values = np.empty(len(points), dtype=object)
+        values[:] = [point["value"] for point in points]
+        series[key] = (ts, values)
+
+    base_ts = series[TELEMETRY_KEYS[0]][0]
+    keep = np.ones(len(base_ts), dtype=bool)
+    positions = {TELEMETRY_KEYS[0]: np.arange(len(base_ts))}
+    for key in TELEMETRY_KEYS[1:]:
+        ts = series[key][0]
+        if len(ts) == 0:
+            keep[:] = False
+            positions[key] = np.zeros(len(base_ts), dtype=np.int64)
+            continue
+        order = np.argsort(ts, kind="stable")
+        sorted_ts = ts[order]
+        if np.any(sorted_ts[1:] == sorted_ts[:-1]):
+            return None
+        idx = np.minimum(np.searchsorted(sorted_ts, base_ts), len(sorted_ts) - 1)
+        keep &= sorted_ts[idx] == base_ts
+        positions[key] = order[idx]
+    if len(base_ts) and np.any(np.sort(base_ts)[1:] == np.sort(base_ts)[:-1]):
+        return None
+
+    def column(key):
+        return series[key][1][positions[key][keep]]
+
+    active = np.char.lower(column("active").astype(str))
+    return {
+        "time": base_ts[keep],
+        "temperature": column("temperature").astype(np.float64),
+        "id": column("id").astype(str),
+        "age": column("age").astype(np.int64),
+        "poids": column("poids").astype(np.float64),
+        "active": (active == "true") | (active == "1"),
+    }
+
+def columns_to_records(columns: dict):
+    """Convertit les colonnes de pivot_telemetry en liste de dictionnaires aux types Python natifs."""
+    values = [columns[name].tolist() for name in TELEMETRY_COLUMNS]
+    return [dict(zip(TELEMETRY_COLUMNS, row)) for row in zip(*values)]
+
 def process_telemetry_data(data: dict):
     """
+    Transforme la réponse de ThingsBoard (où chaque clé est associée à une liste de dicts avec "ts" et "value")
+    en une liste de dictionnaires contenant les champs normalisés :
+      - time (timestamp en millisecondes)
+      - temperature (float)
+      - id (string)
+      - age (int)
+      - poids (float)
+      - active (bool)
+    Seuls les timestamps présents pour toutes les clés sont conservés (cf. pivot_telemetry).
+    """
+    columns = pivot_telemetry(data)
+    if columns is None:
+        return _process_telemetry_data_merge(data)
+    return columns_to_records(columns)
+
+def _process_telemetry_data_merge(data: dict):
+    """
+    Ancienne implémentation par fusions pandas successives, conservée pour les réponses dont une clé contient
+    des timestamps en double (la jointure interne produit alors toutes les combinaisons) et pour les benchmarks.
+
     Transforme la réponse de ThingsBoard (où chaque clé est associée à une liste de dicts avec "ts" et "value")
     en une liste de dictionnaires contenant les champs normalisés :
       - time (timestamp en millisecondes)
@@ -102,67 +227,385 @@ def process_telemetry_data(data: dict):
     return records
 
 # --- Connexion à PostgreSQL pour le stockage ---
-PG_CONN = psycopg2.connect(
-    dbname="loradb",
-    user="postgres",
-    password="passer",
-    host="localhost",
-    port="5432"
-)
-
-def create_table_if_not_exists():
-    """Crée la table 'telemetry_data' si elle n'existe pas déjà."""
-    with PG_CONN.cursor() as cur:
+PG_SETTINGS = {
+    "dbname": os.environ.get("PG_DBNAME", "loradb"),
+    "user": os.environ.get("PG_USER", "postgres"),
+    "password": os.environ.get("PG_PASSWORD", "passer"),
+    "host": os.environ.get("PG_HOST", "localhost"),
+    "port": os.environ.get("PG_PORT", "5432")
+}
+PG_POOL_MIN = 1
+PG_POOL_MAX = 8  # Connexions ouvertes au plus ; au-delà, les requêtes attendent une connexion libre
+
+def _call_with_conn(fn, *args):
+    """Exécute fn(conn, *args) avec une connexion empruntée au pool, rendue même en cas d'erreur."""
+    pool = app.state.pg_pool
+    conn = pool.getconn()
+    try:
+        return fn(conn, *args)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+async def run_db(fn, *args):
+    """
+    Exécute fn(conn, *args) dans un thread, avec sa propre connexion du pool : psycopg2 est bloquant,
+    la boucle asyncio reste libre pendant les requêtes SQL.
+    """
+    async with app.state.pg_slots:
+        return await asyncio.to_thread(_call_with_conn, fn, *args)
+
+def create_table_if_not_exists(conn):
+    """
+    Crée la table 'telemetry_data' si elle n'existe pas déjà, clé primaire (id, time) : deux animaux qui
+    émettent à la même milliseconde ne s'écrasent plus. L'index de clé primaire sert les lectures par animal,
+    un index BRIN sur time (quelques pages pour des centaines de millions de lignes insérées dans l'ordre
+    chronologique) sert les agrégats du troupeau sur une plage de temps.
+    """
+    with conn.cursor() as cur:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS telemetry_data (
-                time BIGINT PRIMARY KEY,
+                time BIGINT NOT NULL,
                 temperature REAL,
-                id TEXT,
+                id TEXT NOT NULL,
                 age INTEGER,
                 poids REAL,
-                active BOOLEAN
+                active BOOLEAN,
+                PRIMARY KEY (id, time)
+            );
+        """)
+        key = telemetry_primary_key(cur)
+        if key != ["id", "time"]:
+            conn.rollback()
+            raise RuntimeError(
+                f"telemetry_data a encore la clé primaire {key} : lancer la migration vers (id, time) avec "
+                "'python migrate_telemetry.py' (aperçu) puis 'python migrate_telemetry.py --apply'"
+            )
+        cur.execute("CREATE INDEX IF NOT EXISTS telemetry_data_time_brin ON telemetry_data USING BRIN (time);")
+        # Point de reprise par device : fin de la dernière fenêtre entièrement stockée
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                device_id TEXT PRIMARY KEY,
+                last_ts BIGINT NOT NULL
             );
         """)
-        PG_CONN.commit()
+        conn.commit()
 
-def store_telemetry_data(records: list[dict]):
-    """Insère ou met à jour les enregistrements de télémétrie dans PostgreSQL."""
-    with PG_CONN.cursor() as cur:
-        for record in records:
+def _primary_key(cur):
+    """Nom et colonnes (triées) de la clé primaire de telemetry_data, ou None si la table n'en a pas."""
+    cur.execute("""
+        SELECT c.conname, array_agg(a.attname::text ORDER BY a.attname)
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey)
+        WHERE c.conrelid = 'telemetry_data'::regclass AND c.contype = 'p'
+        GROUP BY c.conname;
+    """)
+    return cur.fetchone()
+
+def telemetry_primary_key(cur):
+    """Colonnes (triées) de la clé primaire de telemetry_data, ou None si la table n'en a pas."""
+    row = _primary_key(cur)
+    return row[1] if row is not None else None
+
+def migrate_primary_key(conn, apply: bool = False):
+    """
+    Migre une table créée avec l'ancienne clé primaire (time) vers la clé (id, time), en une transaction.
+
+    Les lignes sans id ne peuvent pas entrer dans la nouvelle clé : elles sont copiées dans
+    telemetry_data_null_id avant d'être retirées de telemetry_data. Sans apply, rien n'est modifié et le
+    bilan décrit ce que ferait la migration. Renvoie ce bilan (clé actuelle, lignes, lignes sans id).
+    """
+    with conn.cursor() as cur:
+        row = _primary_key(cur)
+        cur.execute("SELECT count(*), count(*) FILTER (WHERE id IS NULL) FROM telemetry_data;")
+        rows, null_id_rows = cur.fetchone()
+        report = {"primary_key": row[1] if row else None, "rows": rows, "null_id_rows": null_id_rows,
+                  "migrated": False}
+        if (row is not None and row[1] == ["id", "time"]) or not apply:
+            conn.rollback()
+            return report
+        if row is not None:
+            cur.execute(f'ALTER TABLE telemetry_data DROP CONSTRAINT "{row[0]}";')
+        if null_id_rows:
+            cur.execute("CREATE TABLE IF NOT EXISTS telemetry_data_null_id (LIKE telemetry_data);")
+            cur.execute("INSERT INTO telemetry_data_null_id SELECT * FROM telemetry_data WHERE id IS NULL;")
+            cur.execute("DELETE FROM telemetry_data WHERE id IS NULL;")
+        cur.execute("ALTER TABLE telemetry_data ALTER COLUMN id SET NOT NULL, ALTER COLUMN time SET NOT NULL;")
+        cur.execute("ALTER TABLE telemetry_data ADD PRIMARY KEY (id, time);")
+    conn.commit()
+    report["migrated"] = True
+    return report
+
+def get_watermark(conn, device_id: str):
+    """Renvoie le point de reprise (timestamp en ms) du device, ou None s'il n'a jamais été synchronisé."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT last_ts FROM sync_state WHERE device_id = %s;", (device_id,))
+        row = cur.fetchone()
+    conn.commit()
+    return row[0] if row else None
+
+def set_watermark(conn, device_id: str, last_ts: int):
+    """Enregistre le point de reprise du device."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO sync_state (device_id, last_ts) VALUES (%s, %s)
+            ON CONFLICT (device_id) DO UPDATE SET last_ts = EXCLUDED.last_ts;
+        """, (device_id, last_ts))
+    conn.commit()
+
+# Nombre d'enregistrements copiés dans la table de transit puis fusionnés par requête
+BULK_BATCH_SIZE = 10000
+
+def store_telemetry_data(conn, records: list[dict], batch_size: int = BULK_BATCH_SIZE):
+    """Insère ou met à jour des enregistrements (dictionnaires) de télémétrie dans PostgreSQL par lots."""
+    rows = [tuple(record[name] for name in TELEMETRY_COLUMNS) for record in records]
+    return _bulk_upsert(conn, rows, batch_size)
+
+def store_telemetry_columns(conn, columns: dict, batch_size: int = BULK_BATCH_SIZE):
+    """Insère ou met à jour les colonnes produites par pivot_telemetry, sans dictionnaire par ligne."""
+    rows = list(zip(*(columns[name].tolist() for name in TELEMETRY_COLUMNS)))
+    return _bulk_upsert(conn, rows, batch_size)
+
+def _bulk_upsert(conn, rows: list[tuple], batch_size: int):
+    """
+    Insère ou met à jour des lignes (time, temperature, id, age, poids, active) dans PostgreSQL par lots.
+
+    Chaque lot est chargé par COPY dans une table temporaire, puis fusionné dans telemetry_data en une seule
+    requête INSERT ... SELECT ... ON CONFLICT. Si un même couple (id, timestamp) apparaît plusieurs fois, le
+    dernier enregistrement l'emporte, comme avec l'insertion ligne par ligne ; les lignes sans id sont ignorées.
+    Renvoie le nombre de lignes, la durée et le débit (lignes par seconde).
+    """
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS telemetry_staging (
+                seq BIGINT,
+                time BIGINT,
+                temperature REAL,
+                id TEXT,
+                age INTEGER,
+                poids REAL,
+                active BOOLEAN
+            ) ON COMMIT DELETE ROWS;
+        """)
+        for offset in range(0, len(rows), batch_size):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for seq, row in enumerate(rows[offset:offset + batch_size]):
+                writer.writerow((seq, *row))
+            buffer.seek(0)
+            cur.copy_expert(
+                "COPY telemetry_staging (seq, time, temperature, id, age, poids, active) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
             cur.execute("""
                 INSERT INTO telemetry_data (time, temperature, id, age, poids, active)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (time) DO UPDATE SET
+                SELECT DISTINCT ON (id, time) time, temperature, id, age, poids, active
+                FROM telemetry_staging
+                WHERE id IS NOT NULL
+                ORDER BY id, time, seq DESC
+                ON CONFLICT (id, time) DO UPDATE SET
                     temperature = EXCLUDED.temperature,
-                    id = EXCLUDED.id,
                     age = EXCLUDED.age,
                     poids = EXCLUDED.poids,
                     active = EXCLUDED.active;
-            """, (
-                record["time"],
-                record["temperature"],
-                record["id"],
-                record["age"],
-                record["poids"],
-                record["active"]
-            ))
-        PG_CONN.commit()
+            """)
+            cur.execute("TRUNCATE telemetry_staging;")
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": len(rows),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(len(rows) / elapsed) if elapsed > 0 else None
+    }
+
+# --- Lectures pour les tableaux de bord ---
+DEFAULT_QUERY_SPAN_MS = 24 * 60 * 60 * 1000  # Plage par défaut : les dernières 24 heures
+MAX_RAW_ROWS = 50000  # Lignes brutes renvoyées au plus par requête
+MAX_BUCKETS = 10000  # Intervalles d'agrégation au plus par requête
+
+def query_animal_telemetry(conn, animal_id: str, start_ts: int, end_ts: int, limit: int):
+    """Mesures brutes d'un animal sur [start_ts, end_ts[, par ordre chronologique (parcours de la clé primaire)."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT time, temperature, age, poids, active
+            FROM telemetry_data
+            WHERE id = %s AND time >= %s AND time < %s
+            ORDER BY time
+            LIMIT %s;
+        """, (animal_id, start_ts, end_ts, limit))
+        rows = cur.fetchall()
+    conn.commit()
+    return [dict(zip(("time", "temperature", "age", "poids", "active"), row)) for row in rows]
+
+def query_telemetry_aggregates(conn, start_ts: int, end_ts: int, bucket_ms: int, animal_id: str = None):
+    """
+    Agrège côté serveur la télémétrie de [start_ts, end_ts[ par intervalles de bucket_ms : nombre de mesures et
+    min/moyenne/max de la température et du poids, pour un animal ou pour tout le troupeau.
+    """
+    animal_filter = "AND id = %s" if animal_id is not None else ""
+    params = [bucket_ms, bucket_ms, start_ts, end_ts] + ([animal_id] if animal_id is not None else [])
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT time / %s * %s AS bucket, count(*),
+                   min(temperature), avg(temperature), max(temperature),
+                   min(poids), avg(poids), max(poids)
+            FROM telemetry_data
+            WHERE time >= %s AND time < %s {animal_filter}
+            GROUP BY bucket
+            ORDER BY bucket;
+        """, params)
+        rows = cur.fetchall()
+    conn.commit()
+    return [
+        {
+            "bucket": bucket,
+            "count": count,
+            "temperature": {"min": t_min, "avg": t_avg, "max": t_max},
+            "poids": {"min": p_min, "avg": p_avg, "max": p_max}
+        }
+        for bucket, count, t_min, t_avg, t_max, p_min, p_avg, p_max in rows
+    ]
+
+def _time_range(start_ts, end_ts):
+    """Complète et valide une plage [start_ts, end_ts[ en ms (par défaut les dernières 24 heures)."""
+    if end_ts is None:
+        end_ts = int(time.time() * 1000)
+    if start_ts is None:
+        start_ts = end_ts - DEFAULT_QUERY_SPAN_MS
+    if start_ts >= end_ts:
+        raise HTTPException(status_code=400, detail="start_ts doit être strictement inférieur à end_ts")
+    return start_ts, end_ts
+
+# --- Synchronisation incrémentale des devices ---
+# Une synchronisation à la fois par device : deux appels simultanés ne récupèrent pas deux fois la même fenêtre
+_DEVICE_LOCKS = defaultdict(asyncio.Lock)
+
+def _merge_telemetry(first: dict, second: dict):
+    """Concatène deux réponses ThingsBoard en ignorant les points déjà présents (bornes de fenêtres communes)."""
+    merged = {}
+    for key in set(first) | set(second):
+        points = list(first.get(key, []))
+        seen = {point["ts"] for point in points}
+        points.extend(point for point in second.get(key, []) if point["ts"] not in seen)
+        merged[key] = points
+    return merged
+
+async def fetch_window(client: httpx.AsyncClient, device_id: str, start_ts: int, end_ts: int, jwt_token: str):
+    """
+    Récupère toute la télémétrie d'une fenêtre : si une clé atteint la limite de points par requête,
+    la fenêtre est coupée en deux et les deux moitiés sont récupérées simultanément.
+    """
+    raw_data = await get_telemetry(client, device_id, start_ts, end_ts, jwt_token)
+    if end_ts - start_ts > 1 and any(len(points) >= TELEMETRY_PAGE_LIMIT for points in raw_data.values()):
+        middle = (start_ts + end_ts) // 2
+        first, second = await asyncio.gather(
+            fetch_window(client, device_id, start_ts, middle, jwt_token),
+            fetch_window(client, device_id, middle, end_ts, jwt_token)
+        )
+        return _merge_telemetry(first, second)
+    return raw_data
+
+def _store_chunk(conn, device_id: str, raw_data: dict, columns, watermark: int):
+    """Stocke une tranche pivotée (ou, à défaut, fusionnée par pandas) puis avance le point de reprise du device."""
+    if columns is None:  # Timestamps en double : ancienne fusion pandas
+        ingest_stats = store_telemetry_data(conn, _process_telemetry_data_merge(raw_data))
+    else:
+        ingest_stats = store_telemetry_columns(conn, columns)
+    set_watermark(conn, device_id, watermark)
+    return ingest_stats
+
+async def sync_device(client: httpx.AsyncClient, device_id: str, end_ts: int):
+    """
+    Rattrape la télémétrie d'un device depuis son point de reprise jusqu'à end_ts, par tranches de SYNC_CHUNK_MS.
+    Chaque tranche est stockée puis le point de reprise avancé : une synchronisation interrompue reprend
+    à la dernière tranche stockée, sans refaire le travail déjà fait. Le point de reprise ne dépasse jamais
+    end_ts - SYNC_SAFETY_LAG_MS : les mesures arrivées en retard sur ThingsBoard sont récupérées au passage suivant.
+    """
+    async with _DEVICE_LOCKS[device_id]:
+        start_ts = await run_db(get_watermark, device_id)
+        if start_ts is None:
+            start_ts = end_ts - INITIAL_LOOKBACK_MS
+        watermark = start_ts
+        stored_records = 0
+        store_seconds = 0.0
+        chunks = 0
+        while start_ts < end_ts:
+            chunk_end = min(start_ts + SYNC_CHUNK_MS, end_ts)
+            raw_data = await fetch_window(client, device_id, start_ts, chunk_end, JWT_TOKEN)
+            columns = await asyncio.to_thread(pivot_telemetry, raw_data)  # Calcul NumPy hors de la boucle asyncio
+            watermark = max(watermark, min(chunk_end, end_ts - SYNC_SAFETY_LAG_MS))
+            ingest_stats = await run_db(_store_chunk, device_id, raw_data, columns, watermark)
+            stored_records += ingest_stats["rows"]
+            store_seconds += ingest_stats["seconds"]
+            chunks += 1
+            start_ts = chunk_end
+    return {
+        "device_id": device_id,
+        "chunks": chunks,
+        "stored_records": stored_records,
+        "store_seconds": round(store_seconds, 3),
+        "rows_per_second": round(stored_records / store_seconds) if store_seconds > 0 else None,
+        "watermark": watermark
+    }
+
+async def sync_devices(client: httpx.AsyncClient, device_ids: list[str], max_parallel: int = MAX_PARALLEL_FETCHES):
+    """Synchronise plusieurs devices en parallèle (au plus max_parallel à la fois) ; une erreur n'arrête que son device."""
+    end_ts = int(time.time() * 1000)
+    slots = asyncio.Semaphore(max(1, max_parallel))
+
+    async def sync_one(device_id):
+        async with slots:
+            try:
+                return await sync_device(client, device_id, end_ts)
+            except HTTPException as e:
+                return {"device_id": device_id, "error": e.detail, "status_code": e.status_code}
+            except httpx.HTTPError as e:
+                return {"device_id": device_id, "error": f"ThingsBoard injoignable : {e}"}
+
+    return list(await asyncio.gather(*(sync_one(device_id) for device_id in device_ids)))
 
 # --- Endpoint FastAPI pour lancer la récupération, le traitement et le stockage des données ---
 @app.get("/fetch_and_store")
-def fetch_and_store():
+async def fetch_and_store():
     """
-    Interroge l'API de ThingsBoard pour récupérer la télémétrie sur la dernière heure,
-    nettoie et normalise les données à l'aide de pandas, puis les stocke dans PostgreSQL.
-    Renvoie les enregistrements traités.
+    Synchronise de façon incrémentale tous les devices de DEVICE_IDS : seule la télémétrie postérieure au
+    point de reprise de chaque device est récupérée auprès de ThingsBoard, pivotée puis stockée dans PostgreSQL.
+    Renvoie le bilan par device et le débit d'écriture en base (lignes stockées par seconde passée dans
+    les écritures, tous devices confondus).
     """
-    end_ts = int(time.time() * 1000)
-    start_ts = end_ts - (60 * 60 * 1000)  # Dernière heure en millisecondes
-    raw_data = get_telemetry(DEVICE_ID, start_ts, end_ts, JWT_TOKEN)
-    processed_records = process_telemetry_data(raw_data)
-    create_table_if_not_exists()
-    store_telemetry_data(processed_records)
-    return {"status": "success", "stored_records": len(processed_records), "data": processed_records}
+    results = await sync_devices(app.state.http, DEVICE_IDS)
+    stored_records = sum(result.get("stored_records", 0) for result in results)
+    store_seconds = sum(result.get("store_seconds", 0.0) for result in results)
+    return {
+        "status": "success" if all("error" not in result for result in results) else "partial",
+        "stored_records": stored_records,
+        "rows_per_second": round(stored_records / store_seconds) if store_seconds > 0 else None,
+        "devices": results
+    }
+
+@app.get("/animals/{animal_id}/telemetry")
+async def animal_telemetry(animal_id: str, start_ts: int = None, end_ts: int = None,
+                           limit: int = Query(MAX_RAW_ROWS, gt=0, le=MAX_RAW_ROWS)):
+    """Mesures brutes d'un animal sur une plage de temps (timestamps en ms, par défaut les dernières 24 heures)."""
+    start_ts, end_ts = _time_range(start_ts, end_ts)
+    rows = await run_db(query_animal_telemetry, animal_id, start_ts, end_ts, limit)
+    return {"id": animal_id, "start_ts": start_ts, "end_ts": end_ts, "truncated": len(rows) == limit, "rows": rows}
+
+@app.get("/telemetry/aggregate")
+async def telemetry_aggregate(start_ts: int = None, end_ts: int = None, bucket_ms: int = Query(3600000, gt=0),
+                              animal_id: str = None):
+    """
+    Min/moyenne/max par intervalle de bucket_ms, calculés par PostgreSQL : les tableaux de bord reçoivent
+    au plus MAX_BUCKETS points au lieu des lignes brutes. Sans animal_id, agrège tout le troupeau.
+    """
+    start_ts, end_ts = _time_range(start_ts, end_ts)
+    if -(-(end_ts - start_ts) // bucket_ms) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Plus de {MAX_BUCKETS} intervalles : augmenter bucket_ms")
+    buckets = await run_db(query_telemetry_aggregates, start_ts, end_ts, bucket_ms, animal_id)
+    return {"id": animal_id, "start_ts": start_ts, "end_ts": end_ts, "bucket_ms": bucket_ms, "buckets": buckets}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,450 @@
+"""
+Ingestion directe de la télémétrie publiée en MQTT (topics writeattributevalue) dans PostgreSQL.
+
+Le simulateur publie chaque attribut sur son propre topic ({realm}/{client}/writeattributevalue/{attribut}/{asset}),
+ou tout le relevé en un seul message JSON sur l'attribut PACKED_ATTRIBUTE. Ce service s'abonne à ces topics,
+recompose un enregistrement par asset à partir des attributs reçus dans une fenêtre de temps, puis écrit les
+enregistrements par micro-lots dans telemetry_data, avec les fonctions d'écriture en masse du service
+(store_telemetry_data) : plus de sondage de l'API REST de ThingsBoard.
+
+La file entre la réception et l'écriture est bornée : si PostgreSQL ne suit plus, la réception MQTT attend
+(le broker conserve les messages QoS 1 de la session persistante) au lieu de faire grossir la mémoire.
+Le retard de bout en bout (horodatage de la mesure -> écriture) et la contre-pression sont exposés par metrics.py.
+
+Usage :
+    python mqtt_ingest.py --broker localhost --port 8883 --tls --username master:usermqtt --password ...
+    python mqtt_ingest.py --embedded-broker --port 1883    # broker de test local (pip install amqtt)
+"""
+
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+
+import psycopg2
+
+from data import PACKED_ATTRIBUTE
+from metrics import NULL_METRICS, Metrics
+from mqtt_client import PG_SETTINGS, create_table_if_not_exists, store_telemetry_data
+from publisher import make_client
+
+TOPIC = "+/+/writeattributevalue/+/+"
+RECORD_FIELDS = ("temperature", "age", "poids", "active", "time")  # Attributs stockés dans telemetry_data
+
+
+def parse_value(payload):
+    """Décode la valeur d'un attribut : JSON (nombres, chaînes, objets) ou booléen publié tel quel (True/False)."""
+    text = payload.decode("utf-8")
+    try:
+        return json.loads(text)
+    except ValueError:
+        if text in ("True", "False"):
+            return text == "True"
+        return text
+
+
+def parse_bool(value):
+    """Booléen "active" : "true"/"1" (toutes casses) ou True, comme pivot_telemetry ; bool("false") vaudrait True."""
+    return str(value).lower() in ("true", "1")
+
+
+def to_record(asset_id, attributes):
+    """Convertit les attributs d'un asset en ligne de telemetry_data (time reçu en secondes, stocké en ms)."""
+
+    def typed(name, cast):
+        value = attributes.get(name)
+        return None if value is None else cast(value)
+
+    return {
+        "time": int(round(float(attributes["time"]) * 1000)),
+        "temperature": typed("temperature", float),
+        "id": asset_id,
+        "age": typed("age", int),
+        "poids": typed("poids", float),
+        "active": typed("active", parse_bool),
+    }
+
+
+class RecordAssembler:
+    """
+    Recompose un enregistrement par asset à partir des messages d'attributs séparés.
+
+    Un enregistrement est terminé dès que tous les RECORD_FIELDS sont arrivés, ou quand un attribut déjà reçu
+    revient (cycle de publication suivant). Resté incomplet plus de window secondes, il est émis avec des
+    valeurs manquantes s'il a un horodatage, abandonné sinon. Les attributs hors RECORD_FIELDS sont ignorés.
+    """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.pending = {}  # asset_id -> [instant du premier attribut, attributs]
+        self.completed = 0
+        self.incomplete = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, asset_id, attr, value, now=None):
+        """Ajoute un attribut ; renvoie les enregistrements terminés (le plus souvent aucun)."""
+        if attr not in RECORD_FIELDS:
+            return []
+        now = time.monotonic() if now is None else now
+        done = []
+        with self._lock:
+            entry = self.pending.get(asset_id)
+            if entry is not None and attr in entry[1]:
+                done.extend(self._close(asset_id, self.pending.pop(asset_id)[1]))
+                entry = None
+            if entry is None:
+                entry = self.pending[asset_id] = [now, {}]
+            entry[1][attr] = value
+            if len(entry[1]) == len(RECORD_FIELDS):
+                del self.pending[asset_id]
+                done.extend(self._close(asset_id, entry[1]))
+        return done
+
+    def add_packed(self, asset_id, attributes):
+        """Enregistrement reçu en un seul message JSON : terminé immédiatement, sans passer par la fenêtre."""
+        with self._lock:
+            return self._close(asset_id, {name: attributes[name] for name in RECORD_FIELDS if name in attributes})
+
+    def expire(self, now=None, force=False):
+        """Termine les enregistrements plus anciens que window secondes (tous avec force=True)."""
+        now = time.monotonic() if now is None else now
+        done = []
+        with self._lock:
+            for asset_id in [a for a, (first, _) in self.pending.items() if force or now - first >= self.window]:
+                done.extend(self._close(asset_id, self.pending.pop(asset_id)[1]))
+        return done
+
+    def _close(self, asset_id, attributes):
+        if len(attributes) == len(RECORD_FIELDS):
+            self.completed += 1
+        elif "time" in attributes:
+            self.incomplete += 1
+        else:
+            self.dropped += 1
+            return []
+        try:
+            return [to_record(asset_id, attributes)]
+        except (TypeError, ValueError):  # Valeur non numérique : l'enregistrement est inutilisable
+            self.dropped += 1
+            return []
+
+
+class MqttIngest:
+    """
+    Abonné MQTT qui écrit la télémétrie recomposée dans PostgreSQL par micro-lots.
+
+    Le thread réseau de paho recompose les enregistrements et les dépose dans une file bornée ; un thread
+    d'écriture les regroupe (batch_size enregistrements ou flush_interval secondes) et les écrit en une
+    opération COPY + fusion. Une écriture en échec faute de connexion est retentée avec une attente croissante,
+    sans perdre le lot ; une valeur refusée par PostgreSQL (hors bornes, par exemple) n'écarte que les lignes
+    fautives, isolées en coupant le lot en deux, pour que des données invalides ne bloquent pas l'ingestion.
+    À l'arrêt, les enregistrements qui ne peuvent plus être écrits (file pleine, PostgreSQL indisponible) sont
+    comptés dans lost au lieu de bloquer stop().
+    """
+
+    def __init__(self, broker="localhost", port=1883, topic=TOPIC, client_id="cattle_ingest", username=None,
+                 password=None, tls=False, qos=1, window=5.0, batch_size=500, flush_interval=1.0, queue_size=10000,
+                 enqueue_timeout=90.0, metrics=NULL_METRICS, connect=None):
+        """
+        Args:
+            broker (str): Hôte du broker MQTT.
+            port (int): Port du broker.
+            topic (str): Filtre d'abonnement.
+            client_id (str): Identifiant fixe : la session persistante conserve les messages pendant une coupure.
+            username (str): Utilisateur MQTT (None : connexion anonyme).
+            password (str): Mot de passe MQTT.
+            tls (bool): Active TLS (certificats auto-signés acceptés, comme le simulateur).
+            qos (int): Qualité de service de l'abonnement.
+            window (float): Durée maximale d'assemblage d'un enregistrement, en secondes.
+            batch_size (int): Enregistrements écrits au plus par lot.
+            flush_interval (float): Délai maximal avant l'écriture d'un lot incomplet, en secondes.
+            queue_size (int): Enregistrements en attente d'écriture au-delà desquels la réception attend.
+            enqueue_timeout (float): Attente maximale d'une place dans la file, en secondes ; au-delà,
+                l'enregistrement est perdu. Par défaut 1,5 keepalive : le broker a alors coupé la connexion
+                muette et renverra à la reconnexion les messages QoS 1 non acquittés de la session persistante.
+            metrics (Metrics): Instrumentation (désactivée par défaut).
+            connect: Fonction ouvrant une connexion PostgreSQL (par défaut avec PG_SETTINGS).
+        """
+        self.broker = broker
+        self.port = port
+        self.topic = topic
+        self.qos = qos
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.assembler = RecordAssembler(window)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = metrics
+        self.connect = connect or (lambda: psycopg2.connect(**PG_SETTINGS))
+        self.written = 0
+        self.rejected = 0  # Enregistrements refusés par PostgreSQL et écartés
+        self.lost = 0  # Enregistrements abandonnés sans être écrits (attente de la file dépassée, arrêt sans PostgreSQL)
+        self.last_lag = 0.0  # Secondes entre la mesure la plus ancienne du dernier lot et son écriture
+        self._conn = None
+        self._stop = threading.Event()  # Fin de la réception : le thread d'écriture vide la file puis s'arrête
+        self._closing = threading.Event()  # Arrêt demandé : le thread réseau n'attend plus de place dans la file
+        self._give_up = False  # PostgreSQL indisponible pendant l'arrêt : les lots restants ne sont plus tentés
+        self._writer = threading.Thread(target=self._run, name="mqtt-ingest-writer", daemon=True)
+
+        # Même configuration TLS/authentification que les publications (publisher.make_client), session persistante
+        self.client = make_client(client_id, tls=tls, username=username, password=password, clean_session=False)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+        metrics.gauge("ingest_queue_depth", self.queue.qsize)
+        metrics.gauge("ingest_pending_assets", lambda: len(self.assembler.pending))
+        metrics.gauge("ingest_lag_seconds", lambda: self.last_lag)
+
+    def start(self):
+        """Prépare le schéma, démarre le thread d'écriture puis l'abonnement MQTT."""
+        self._conn = self.connect()
+        create_table_if_not_exists(self._conn)
+        self._writer.start()
+        self.client.connect(self.broker, self.port, keepalive=60)
+        self.client.loop_start()
+
+    def stop(self):
+        """
+        Arrête la réception, écrit les enregistrements en attente (y compris incomplets) et ferme la connexion.
+
+        Ne bloque pas si PostgreSQL est indisponible : le thread réseau cesse d'attendre la file, le thread
+        d'écriture fait une dernière tentative puis abandonne ; les enregistrements non écrits sont comptés.
+        """
+        self._closing.set()  # Avant loop_stop() : le thread réseau peut attendre une place dans une file pleine
+        self.client.loop_stop()
+        self.client.disconnect()
+        self._stop.set()
+        self._writer.join()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+            self._conn = None
+        if self.lost:
+            print(f"Arrêt : {self.lost} enregistrements perdus, non écrits dans PostgreSQL")
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            print(f"Connecté au broker MQTT {self.broker}:{self.port}, abonnement à {self.topic}")
+            client.subscribe(self.topic, qos=self.qos)  # Renouvelé à chaque reconnexion
+        else:
+            print("Erreur de connexion au broker MQTT, code:", rc)
+
+    def _on_message(self, client, userdata, message):
+        parts = message.topic.split("/")
+        if len(parts) != 5 or parts[2] != "writeattributevalue":
+            return
+        self.metrics.inc("ingest_messages")
+        try:
+            value = parse_value(message.payload)
+        except UnicodeDecodeError:
+            self.metrics.inc("ingest_invalid_messages")
+            return
+        attr, asset_id = parts[3], parts[4]
+        if attr == PACKED_ATTRIBUTE and isinstance(value, dict):
+            records = self.assembler.add_packed(asset_id, value)
+        else:
+            records = self.assembler.add(asset_id, attr, value)
+        for record in records:
+            self._enqueue(record)
+
+    def _enqueue(self, record):
+        """
+        Dépose un enregistrement ; file pleine, le thread réseau attend : c'est la contre-pression. L'attente
+        est limitée à enqueue_timeout secondes et cesse dès que l'arrêt est demandé ; l'enregistrement est alors perdu.
+        """
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        self.metrics.inc("ingest_backpressure")
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.enqueue_timeout
+        while not self._closing.is_set() and time.monotonic() < deadline:
+            try:
+                self.queue.put(record, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        else:
+            self._lose([record], "arrêt en cours" if self._closing.is_set() else
+                       f"file pleine depuis {self.enqueue_timeout:.0f} s")
+        self.metrics.observe("ingest_backpressure_wait", time.perf_counter() - start)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not (self._stop.is_set() and self.queue.empty()):
+            try:
+                batch.append(self.queue.get(timeout=max(0.0, min(0.1, deadline - time.monotonic()))))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if now >= deadline:
+                batch.extend(self.assembler.expire(now))
+                deadline = now + self.flush_interval
+                if batch:
+                    self._write(batch)
+                    batch = []
+            elif len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        batch.extend(self.assembler.expire(force=True))
+        if batch:
+            self._write(batch)
+
+    def _lose(self, records, reason):
+        self.lost += len(records)
+        self.metrics.inc("ingest_lost_records", len(records))
+        if not self._closing.is_set():  # À l'arrêt, un seul bilan est affiché par stop()
+            print(f"{len(records)} enregistrement(s) perdu(s), non écrit(s) : {reason}")
+
+    def _reject(self, records, error):
+        self.rejected += len(records)
+        self.metrics.inc("ingest_rejected_records", len(records))
+        detail = f" : {records[0]}" if len(records) == 1 else ""
+        print(f"{len(records)} enregistrement(s) écarté(s), refusé(s) par PostgreSQL ({str(error).strip()}){detail}")
+
+    def _store_valid(self, batch):
+        """
+        Écrit un lot en écartant les lignes refusées par PostgreSQL : en cas d'erreur de données, le lot est
+        coupé en deux jusqu'à isoler les lignes fautives. Renvoie le nombre d'enregistrements écrits.
+        """
+        try:
+            store_telemetry_data(self._conn, batch)
+            return len(batch)
+        except (psycopg2.DataError, psycopg2.IntegrityError) as e:
+            self._conn.rollback()
+            if len(batch) == 1:
+                self._reject(batch, e)
+                return 0
+            middle = len(batch) // 2
+            return self._store_valid(batch[:middle]) + self._store_valid(batch[middle:])
+
+    def _write(self, batch):
+        """
+        Écrit un lot. Connexion perdue : rouvre la connexion et réessaie ; à l'arrêt, une seule tentative, puis
+        ce lot et les suivants sont perdus. Données refusées : seules les lignes fautives sont écartées. Autre
+        erreur PostgreSQL (schéma, droits) : le lot est écarté plutôt que de bloquer la réception.
+        """
+        if self._give_up:
+            self._lose(batch, "PostgreSQL indisponible à l'arrêt")
+            return
+        delay = 0.5
+        while True:
+            try:
+                if self._conn is None:
+                    self._conn = self.connect()
+                with self.metrics.timer("ingest_write"):
+                    written = self._store_valid(batch)
+                break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self.metrics.inc("ingest_write_errors")
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except psycopg2.Error:
+                        pass
+                    self._conn = None
+                if self._stop.is_set():
+                    self._give_up = True
+                    self._lose(batch, "PostgreSQL indisponible à l'arrêt")
+                    return
+                print(f"Écriture PostgreSQL impossible ({str(e).strip()}), nouvelle tentative dans {delay:.1f} s")
+                self._stop.wait(delay)  # Réveillé par stop() : dernière tentative immédiate
+                delay = min(delay * 2, 30.0)
+            except psycopg2.Error as e:
+                self.metrics.inc("ingest_write_errors")
+                try:
+                    self._conn.rollback()
+                except psycopg2.Error:
+                    self._conn = None
+                self._reject(batch, e)
+                return
+        if not written:
+            return
+        self.written += written
+        self.metrics.inc("ingest_records", written)
+        self.last_lag = max(0.0, time.time() - min(record["time"] for record in batch) / 1000)
+        self.metrics.observe("ingest_lag", self.last_lag)
+
+    def stats(self):
+        """Bilan de l'ingestion depuis le démarrage."""
+        return {
+            "written": self.written,
+            "queued": self.queue.qsize(),
+            "pending_assets": len(self.assembler.pending),
+            "completed": self.assembler.completed,
+            "incomplete": self.assembler.incomplete,
+            "dropped": self.assembler.dropped,
+            "rejected": self.rejected,
+            "lost": self.lost,
+            "lag_seconds": round(self.last_lag, 3),
+        }
+
+
+def start_embedded_broker(host="127.0.0.1", port=1883):
+    """Démarre un broker MQTT amqtt local dans un thread, pour les tests sans OpenRemote (amqtt est optionnel)."""
+    try:
+        from amqtt.broker import Broker
+    except ImportError as e:
+        raise ImportError("Le broker embarqué nécessite amqtt : pip install amqtt") from e
+
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    config = {"listeners": {"default": {"type": "tcp", "bind": f"{host}:{port}"}}}
+
+    async def serve():
+        await Broker(config).start()  # Le broker doit être créé dans sa boucle asyncio
+        started.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(serve())
+        loop.run_forever()
+
+    threading.Thread(target=run, name="mqtt-broker", daemon=True).start()
+    if not started.wait(10):
+        raise RuntimeError(f"Le broker embarqué n'a pas démarré sur {host}:{port}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--broker", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--window", type=float, default=5.0, help="Fenêtre d'assemblage d'un enregistrement (s)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--metrics-port", type=int, default=9101)
+    parser.add_argument("--embedded-broker", action="store_true", help="Démarre un broker amqtt local sur --port")
+    args = parser.parse_args()
+
+    if args.embedded_broker:
+        start_embedded_broker(port=args.port)
+        args.broker = "127.0.0.1"
+    metrics = Metrics(enabled=True)
+    metrics.serve(args.metrics_port)
+    ingest = MqttIngest(args.broker, args.port, args.topic, username=args.username, password=args.password,
+                        tls=args.tls, window=args.window, batch_size=args.batch_size,
+                        flush_interval=args.flush_interval, queue_size=args.queue_size, metrics=metrics)
+    ingest.start()
+    try:
+        while True:
+            time.sleep(10)
+            print(json.dumps(ingest.stats()))
+    except KeyboardInterrupt:
+        print("Arrêt de l'ingestion...")
+    ingest.stop()
+    print(json.dumps(ingest.stats()))
@@ -0,0 +1,115 @@
+import os
+
+import cv2
+from ultralytics import YOLO
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+from tracker1 import ObjectCounter
+
+
+class MultiStreamCounter:
+    """
+    Compte les objets sur N flux vidéo avec un seul modèle YOLO partagé.
+
+    Les images des N sources passent dans une seule inférence batchée ; chaque source garde son propre
+    tracker et son propre ObjectCounter (région, track_history, counted_ids, classwise_counts).
+    """
+
+    def __init__(self, regions, model="yolo11n.pt", tracker="bytetrack.yaml", frame_rate=30, events_dir="events",
+                 **kwargs):
+        """
+        Args:
+            regions (list): Une liste de points de région par source.
+            model (str): Poids YOLO chargés une seule fois pour toutes les sources.
+            tracker (str): Configuration du tracker instancié pour chaque source.
+            frame_rate (int): Fréquence d'images transmise aux trackers.
+            events_dir (str): Dossier des événements ; chaque source écrit dans son sous-dossier <events_dir>/<index>.
+            **kwargs: Arguments transmis à chaque ObjectCounter (show_in, show_out, line_width, ...).
+        """
+        self.model = YOLO(model)
+        # Un modèle déjà chargé est partagé par les compteurs au lieu d'être rechargé pour chaque source. Chaque
+        # source a son propre dossier d'événements : un seul fichier du jour partagé par N EventSink mélangerait
+        # les caméras et pourrait recevoir plusieurs en-têtes
+        self.counters = [
+            ObjectCounter(region=region, model=self.model, events_dir=os.path.join(events_dir, str(index)), **kwargs)
+            for index, region in enumerate(regions)
+        ]
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+        self.trackers = [TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate) for _ in regions]
+
+        reference = self.counters[0]
+        self.predict_args = {k: v for k, v in reference.track_add_args.items() if k != "tracker"}
+        self.predict_args["classes"] = reference.CFG["classes"]
+
+    def count(self, frames):
+        """
+        Traite une image par source en une seule passe du modèle et met à jour les comptages de chaque source.
+
+        Args:
+            frames (list): Une image par source, dans le même ordre que les régions.
+
+        Returns:
+            (list): Les images annotées, dans le même ordre.
+        """
+        results = self.model.predict(frames, **self.predict_args)
+        outputs = []
+        for frame, result, tracker, counter in zip(frames, results, self.trackers, self.counters):
+            det = result.boxes.cpu().numpy()
+            tracks = tracker.update(det, frame) if len(det) else []
+            counter.apply_tracks(tracks)
+            outputs.append(counter.process_tracks(frame))
+        return outputs
+
+    def finalize(self):
+        """Déclenche la vérification de fin de flux pour chaque source."""
+        for counter in self.counters:
+            counter.finalize()
+
+
+if __name__ == "__main__":
+    # Une entrée par caméra : source vidéo et points de la région de comptage associée
+    sources = ["cattlecount.mp4", "vid.mp4"]
+    regions = [
+        [(569, 5), (569, 499)],
+        [(569, 5), (569, 499)],
+    ]
+
+    counter = MultiStreamCounter(
+        regions,
+        model="yolo11n.pt",
+        show_in=True,
+        show_out=True,
+        line_width=2,
+    )
+    caps = [cv2.VideoCapture(source) for source in sources]
+
+    count = 0
+    while True:
+        frames = []
+        for cap in caps:
+            ret, frame = cap.read()
+            if not ret:
+                # Si la vidéo se termine, on revient au début
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read()
+            frames.append(frame)
+        if any(frame is None for frame in frames):
+            break
+        count += 1
+        if count % 2 != 0:  # Ignore les images impaires
+            continue
+
+        frames = [cv2.resize(frame, (1020, 500)) for frame in frames]
+        frames = counter.count(frames)
+
+        for i, frame in enumerate(frames):
+            cv2.imshow(f"FRAME {i}", frame)
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            break
+
+    for cap in caps:
+        cap.release()
+    cv2.destroyAllWindows()
+    counter.finalize()
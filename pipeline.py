@@ -0,0 +1,267 @@
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from metrics import NULL_METRICS
+
+_STOP = object()  # Sentinelle de fin de flux propagée d'un étage à l'autre
+
+
+class StageStats:
+    """Compteur de débit (images par seconde) d'un étage du pipeline."""
+
+    def __init__(self, name):
+        self.name = name
+        self.frames = 0
+        self.start = None
+        self.last = None
+
+    def tick(self):
+        """Enregistre une image traitée par l'étage."""
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+        self.last = now
+        self.frames += 1
+
+    def fps(self):
+        """Débit moyen de l'étage depuis sa première image."""
+        if self.start is None or self.last == self.start:
+            return 0.0
+        return (self.frames - 1) / (self.last - self.start)
+
+
+class FrameQueue:
+    """
+    File bornée entre deux étages du pipeline.
+
+    Avec la politique "drop_oldest", un producteur qui trouve la file pleine jette l'image la plus
+    ancienne : une caméra en direct n'accumule ainsi jamais de retard. Avec "block", le producteur
+    attend que le consommateur libère de la place (aucune image perdue, utile sur fichier).
+    """
+
+    POLICIES = ("drop_oldest", "block")
+
+    def __init__(self, maxsize=4, policy="drop_oldest"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Politique inconnue : {policy!r} (attendu : {', '.join(self.POLICIES)})")
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.policy = policy
+        self.dropped = 0  # Nombre d'images jetées faute de place
+
+    def put(self, item, stop_event):
+        """Ajoute un élément ; renvoie False si le pipeline a été arrêté entre-temps."""
+        if self.policy == "drop_oldest" and item is not _STOP:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return True
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while not stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, stop_event):
+        """Retire un élément ; renvoie _STOP si le pipeline a été arrêté entre-temps."""
+        while not stop_event.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _STOP
+
+    def qsize(self):
+        return self.queue.qsize()
+
+
+def default_policy(source):
+    """
+    Politique des files adaptée à la source.
+
+    Un fichier vidéo se décode plus vite que l'inférence : avec "drop_oldest", les images jetées dépendraient
+    de la charge de la machine et les comptages varieraient d'une exécution à l'autre. "block" traite alors
+    toutes les images retenues par frame_step, de façon reproductible. Une caméra ou un flux réseau garde
+    "drop_oldest" pour ne jamais accumuler de retard.
+    """
+    return "block" if isinstance(source, str) and os.path.isfile(source) else "drop_oldest"
+
+
+class PipelineRunner:
+    """
+    Exécute la boucle capture → redimensionnement → suivi/comptage → affichage en étages parallèles.
+
+    Chaque étage tourne dans son propre thread et communique avec le suivant par une FrameQueue
+    bornée : le décodage de l'image suivante se fait pendant l'inférence de l'image courante.
+    L'étage d'affichage tourne dans le thread appelant (cv2.imshow doit rester dans le thread principal).
+    """
+
+    def __init__(self, source, counter, size=(1020, 500), frame_step=2, queue_size=4,
+                 policy=None, loop=False, window_name="FRAME", headless=False, gate=None,
+                 metrics=None):
+        self.source = source
+        self.counter = counter
+        self.size = size
+        self.frame_step = frame_step  # Ne traite qu'une image sur frame_step
+        self.loop = loop  # Relit la vidéo depuis le début en fin de fichier
+        self.window_name = window_name
+        self.headless = headless  # Aucune fenêtre : les comptages sont seulement journalisés
+        self.gate = gate  # MotionGate décidant quelles images redimensionnées passent au comptage
+        # Instrumentation par étage (latences, FPS, profondeur des files, comptages), partagée avec le compteur
+        self.metrics = metrics or NULL_METRICS
+        counter.metrics = self.metrics
+
+        self.stats = {name: StageStats(name) for name in ("decode", "resize", "count", "display")}
+        policy = policy or default_policy(source)  # None : choisie selon la source (cf. default_policy)
+        self.queues = {name: FrameQueue(queue_size, policy) for name in ("resize", "count", "display")}
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = []
+
+        for name, q in self.queues.items():
+            self.metrics.gauge("queue_depth", q.qsize, queue=name)
+            self.metrics.gauge("queue_dropped", lambda q=q: q.dropped, queue=name)
+        self.metrics.gauge("count", lambda: counter.in_count, direction="in")
+        self.metrics.gauge("count", lambda: counter.out_count, direction="out")
+
+    def _decode(self):
+        """Étage de capture : lit les images de la source et les pousse vers le redimensionnement."""
+        cap = cv2.VideoCapture(self.source)
+        outbox = self.queues["resize"]
+        index = 0
+        try:
+            while not self._stop.is_set():
+                with self.metrics.timer("cap_read"):
+                    ret, frame = cap.read()
+                if not ret:
+                    if self.loop:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    break
+                index += 1
+                if index % self.frame_step != 0:
+                    continue
+                self.stats["decode"].tick()
+                if not outbox.put(frame, self._stop):
+                    break
+        finally:
+            cap.release()
+            outbox.put(_STOP, self._stop)
+
+    def _stage(self, name, fn, inbox, outbox):
+        """Boucle générique d'un étage : applique fn à chaque image de inbox et pousse le résultat."""
+        while True:
+            item = inbox.get(self._stop)
+            if item is _STOP:
+                break
+            result = fn(item)
+            self.stats[name].tick()
+            if result is None:  # Image écartée par l'étage
+                continue
+            if not outbox.put(result, self._stop):
+                break
+        outbox.put(_STOP, self._stop)
+
+    def _resize(self, frame):
+        """Redimensionne l'image et la soumet au filtre de mouvement s'il y en a un."""
+        with self.metrics.timer("resize"):
+            frame = cv2.resize(frame, self.size)
+        if self.gate is not None and not self.gate.should_process(frame):
+            return None
+        return frame
+
+    def _guard(self, target, *args):
+        """Exécute un étage et arrête tout le pipeline si une exception s'y produit."""
+        try:
+            target(*args)
+        except BaseException as e:  # noqa: BLE001 - l'erreur est relancée dans le thread appelant
+            self.error = e
+            self._stop.set()
+
+    def start(self):
+        """Démarre les threads de capture, de redimensionnement et de comptage."""
+        stages = [
+            (self._decode,),
+            (self._stage, "resize", self._resize, self.queues["resize"], self.queues["count"]),
+            (self._stage, "count", self.counter.count, self.queues["count"], self.queues["display"]),
+        ]
+        for args in stages:
+            thread = threading.Thread(target=self._guard, args=args, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Demande l'arrêt de tous les étages et attend leur fin."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def frames(self):
+        """Itère sur les images annotées en sortie du pipeline, dans le thread appelant."""
+        inbox = self.queues["display"]
+        while True:
+            frame = inbox.get(self._stop)
+            if frame is _STOP:
+                break
+            yield frame
+        if self.error is not None:
+            raise self.error
+
+    def run(self, report_every=5.0):
+        """
+        Lance le pipeline et affiche les images jusqu'à la fin du flux ou l'appui sur "q".
+
+        En mode headless, rien n'est affiché : la boucle consomme les images jusqu'à la fin du flux
+        ou un Ctrl+C et journalise les comptages avec les FPS.
+
+        Args:
+            report_every (float): Intervalle en secondes entre deux affichages des FPS par étage (0 pour désactiver).
+        """
+        self.start()
+        last_report = time.perf_counter()
+        try:
+            for frame in self.frames():
+                if not self.headless:
+                    with self.metrics.timer("display"):
+                        cv2.imshow(self.window_name, frame)
+                        key = cv2.waitKey(1) & 0xFF
+                    if key == ord("q"):
+                        break
+                self.stats["display"].tick()
+                if report_every and time.perf_counter() - last_report >= report_every:
+                    print(self.report())
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            if not self.headless:
+                cv2.destroyAllWindows()
+
+    def report(self):
+        """Résumé des FPS par étage et des images jetées par file."""
+        fps = " | ".join(f"{name} {stats.fps():.1f} FPS" for name, stats in self.stats.items())
+        dropped = ", ".join(f"{name}={q.dropped}" for name, q in self.queues.items())
+        report = f"{fps} | jetées : {dropped}"
+        if self.headless:
+            report += f" | IN {self.counter.in_count} OUT {self.counter.out_count}"
+        if self.gate is not None:
+            gate = self.gate.stats()
+            report += f" | traitées {gate['processed']} ignorées {gate['skipped']}"
+        state = getattr(self.counter, "track_state", None)
+        if state is not None:  # Résumé publié par le thread de comptage : le store change pendant la lecture
+            snapshot = state.snapshot
+            report += f" | pistes : {snapshot['active_tracks']} ({snapshot['memory_bytes'] / 1024:.0f} Ko)"
+        return report
@@ -0,0 +1,361 @@
+"""
+Publication MQTT partagée vers OpenRemote : connexion TLS/authentification commune et file hors ligne.
+
+Publisher garde une seule connexion ouverte (reconnexion automatique avec attente croissante) et publie
+depuis un thread dédié, par lots dont les acquittements sont attendus ensemble. Les messages attendent en
+mémoire ; quand la liaison tombe ou que la mémoire dépasse sa limite, ce thread les ajoute par lots à un
+fichier local en ajout seul, rejoué dans l'ordre au retour de la liaison. La position de rejeu est conservée
+dans un fichier d'offset : un redémarrage reprend là où le précédent s'était arrêté (livraison au moins une
+fois). Une ligne tronquée par un arrêt brutal pendant l'écriture est retirée à l'ouverture ; une ligne
+illisible est mise de côté dans spool.bad au lieu de bloquer le rejeu.
+"""
+
+import atexit
+import functools
+import json
+import os
+import random
+import ssl
+import threading
+import time
+from collections import deque
+from itertools import islice
+
+import paho.mqtt.client as mqtt
+
+
+def on_connect(client, userdata, flags, rc, tls=True):
+    mode = "TLS" if tls else "sans TLS"
+    if rc == 0:
+        print(f"✅ Connecté avec succès au broker MQTT ({mode})")
+    else:
+        print(f"❌ Erreur de connexion au broker MQTT ({mode}), code:", rc)
+
+
+def make_client(client_id, tls=True, username=None, password=None, clean_session=True):
+    """
+    Crée un client MQTT configuré (TLS sans vérification de certificat, authentification), pas encore connecté.
+
+    clean_session=False garde la session côté broker : les messages QoS 1 reçus pendant une coupure sont livrés
+    à la reconnexion d'un abonné (identifiant client fixe requis).
+    """
+    client = mqtt.Client(client_id=client_id, clean_session=clean_session)
+    if tls:
+        client.tls_set(
+            ca_certs=None,  # CA système par défaut
+            certfile=None,
+            keyfile=None,
+            cert_reqs=ssl.CERT_NONE,  # ne vérifie pas le certificat (self-signed)
+            tls_version=ssl.PROTOCOL_TLS,
+            ciphers=None,
+        )
+        client.tls_insecure_set(True)  # autorise les certificats invalides
+    if username is not None:
+        client.username_pw_set(username, password)
+    client.on_connect = functools.partial(on_connect, tls=tls)
+    return client
+
+
+class _Spool:
+    """
+    Fichier de messages en ajout seul (une ligne JSON par message) et offset du premier message non publié.
+
+    Utilisé par le seul thread de publication (et par close() une fois ce thread arrêté).
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "spool.jsonl")
+        self.offset_path = os.path.join(directory, "spool.offset")
+        self.bad_path = os.path.join(directory, "spool.bad")
+        self.quarantined = 0  # Lignes illisibles mises de côté dans spool.bad
+        self.offset = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as file:
+                try:
+                    self.offset = int(file.read().strip() or 0)
+                except ValueError:  # Offset illisible : tout est rejoué (livraison au moins une fois)
+                    self.offset = 0
+        truncated = self._drop_partial_line()
+        if truncated:
+            print(f"File hors ligne : {truncated} octets d'un message incomplet (arrêt pendant l'écriture) retirés")
+        self.file = open(self.path, "ab")
+        self.size = self.file.tell()
+        self.offset = min(self.offset, self.size)
+
+    def _drop_partial_line(self):
+        """Tronque le fichier après son dernier saut de ligne ; renvoie le nombre d'octets retirés."""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r+b") as file:
+            size = end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - 65536)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                file.truncate(end)
+        return size - end
+
+    def pending(self):
+        return self.size > self.offset
+
+    def append(self, messages):
+        data = b"".join(json.dumps(message).encode() + b"\n" for message in messages)
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.size += len(data)
+
+    def read(self, count):
+        """
+        Renvoie jusqu'à count messages à partir de l'offset, et l'offset qui suit le dernier. Les lignes
+        illisibles sont copiées dans spool.bad et sautées : la liste peut être vide avec un offset qui avance.
+        """
+        messages = []
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            end = self.offset
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break  # Ligne incomplète
+                end += len(line)
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict) or "topic" not in message or "payload" not in message:
+                    self._quarantine(line)
+                    continue
+                messages.append(message)
+                if len(messages) >= count:
+                    break
+        return messages, end
+
+    def _quarantine(self, line):
+        with open(self.bad_path, "ab") as file:
+            file.write(line)
+        self.quarantined += 1
+        print(f"File hors ligne : message illisible mis de côté dans {self.bad_path}")
+
+    def commit(self, offset):
+        """Avance l'offset (fichier temporaire synchronisé puis renommé) ; vide le fichier quand tout a été publié."""
+        if offset >= self.size:
+            self.file.truncate(0)
+            self.file.seek(0)
+            self.size = offset = 0
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w") as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())  # Sans fsync, le renommage peut survivre à un arrêt brutal et pas le contenu
+        os.replace(tmp, self.offset_path)
+        self.offset = offset
+
+    def close(self):
+        self.file.close()
+
+
+class Publisher:
+    """
+    Connexion MQTT longue durée avec publication par lots, file en mémoire et débordement sur disque.
+
+    publish() ne bloque jamais et ne touche pas au disque : il dépose le message en mémoire. Le thread de
+    publication écrit sur disque, par lots et avec un seul fsync, les messages en mémoire quand la liaison est
+    coupée (au plus spill_interval secondes après leur dépôt) ou au-delà de queue_size messages. Le disque
+    contient toujours les messages les plus anciens et il est rejoué en premier : l'ordre est conservé.
+    """
+
+    def __init__(self, broker, port, client_id, username=None, password=None, tls=True, realm="master",
+                 asset_id=None, qos=1, queue_size=1000, batch_size=50, spool_dir="mqtt_spool", ack_timeout=10.0,
+                 keepalive=60, max_reconnect_delay=120, spill_interval=0.5):
+        """
+        Args:
+            broker (str): Hôte du broker MQTT.
+            port (int): Port du broker.
+            client_id (str): Identifiant du client MQTT.
+            username (str): Utilisateur (None : connexion anonyme).
+            password (str): Mot de passe.
+            tls (bool): Active TLS.
+            realm (str): Realm OpenRemote utilisé par publish_attribute.
+            asset_id (str): Asset OpenRemote utilisé par publish_attribute.
+            qos (int): Qualité de service des publications.
+            queue_size (int): Messages gardés en mémoire au plus ; au-delà, ils vont sur disque.
+            batch_size (int): Messages publiés avant d'attendre leurs acquittements.
+            spool_dir (str): Dossier du fichier hors ligne et de son offset.
+            ack_timeout (float): Attente maximale des acquittements d'un lot avant de revérifier la connexion.
+            keepalive (int): Intervalle keepalive MQTT, en secondes.
+            max_reconnect_delay (int): Attente maximale entre deux tentatives de reconnexion, en secondes.
+            spill_interval (float): Liaison coupée, délai maximal avant l'écriture sur disque des messages déposés.
+        """
+        self.broker = broker
+        self.port = port
+        self.client_id = client_id
+        self.tls = tls
+        self.realm = realm
+        self.asset_id = asset_id
+        self.qos = qos
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.ack_timeout = ack_timeout
+        self.spill_interval = spill_interval
+        self.memory = deque()
+        self.spool = _Spool(spool_dir)
+        self.published = 0
+        self.spilled = 0  # Messages passés par le fichier hors ligne
+        self.errors = 0  # Exceptions rattrapées dans le thread de publication
+        self._inflight = None  # Lot publié dont les acquittements sont attendus : (infos, depuis la mémoire, offset)
+        self._inflight_memory = 0  # Messages en tête de memory appartenant au lot en vol (gardés jusqu'à l'ack)
+        self._connected = threading.Event()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.client = make_client(client_id, tls=tls, username=username, password=password)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.max_inflight_messages_set(max(batch_size, 20))
+        # Attente initiale tirée au hasard : des compteurs coupés en même temps ne se reconnectent pas ensemble
+        self.client.reconnect_delay_set(min_delay=1 + random.randint(0, 4), max_delay=max_reconnect_delay)
+        self.client.connect_async(broker, port, keepalive=keepalive)
+        self.client.loop_start()  # Connexion et reconnexions gérées par le thread réseau de paho
+
+        self._thread = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def attribute_topic(self, attr):
+        return f"{self.realm}/{self.client_id}/writeattributevalue/{attr}/{self.asset_id}"
+
+    def publish_attribute(self, attr, value):
+        """Publie la valeur d'un attribut de l'asset (dictionnaires et listes encodés en JSON)."""
+        self.publish(self.attribute_topic(attr), value)
+
+    def publish(self, topic, payload):
+        """Dépose un message pour publication, sans bloquer ni écrire sur disque (appelable depuis le comptage)."""
+        if isinstance(payload, (dict, list, str)):
+            payload = json.dumps(payload)
+        else:
+            payload = str(payload)  # Nombres et booléens tels que paho les publie
+        with self._lock:
+            self.memory.append({"topic": topic, "payload": payload})
+        self._wake.set()
+
+    def _on_connect(self, client, userdata, flags, rc):
+        on_connect(client, userdata, flags, rc, tls=self.tls)
+        if rc == 0:
+            self._connected.set()
+            self._wake.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._connected.clear()
+        if rc != 0:
+            print(f"Liaison MQTT perdue (code {rc}), messages conservés sur disque jusqu'à la reconnexion")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.spill_interval)
+            self._wake.clear()
+            try:
+                if not self._connected.is_set():
+                    self._spill(everything=True)  # Liaison coupée : mémoire sur disque, un fsync par réveil
+                    self._stop.wait(self.spill_interval)  # Regroupe les messages déposés entre deux écritures
+                    continue
+                while self._connected.is_set() and not self._stop.is_set() and self._send_batch():
+                    pass
+                self._spill()
+            except Exception as e:  # noqa: BLE001 - le thread ne doit pas mourir : la publication s'arrêterait
+                self.errors += 1
+                print(f"Erreur du thread de publication MQTT ({e!r}), reprise dans 1 s")
+                self._stop.wait(1.0)
+
+    def _spill(self, everything=False):
+        """Écrit sur disque les messages en mémoire hors lot en vol : tous, ou seulement au-delà de queue_size."""
+        with self._lock:
+            keep = self._inflight_memory
+            if len(self.memory) - keep <= (0 if everything else self.queue_size):
+                return
+            messages = list(islice(self.memory, keep, None))
+        self.spool.append(messages)  # Hors verrou : publish() n'attend jamais le disque
+        with self._lock:
+            for _ in messages:  # publish() n'ajoute qu'en queue : ces messages sont toujours juste après le lot en vol
+                del self.memory[keep]
+            self.spilled += len(messages)
+
+    def _send_batch(self):
+        """Publie un lot (le disque d'abord, plus ancien que la mémoire) ; renvoie True s'il a été traité."""
+        if self._inflight is None:
+            if self.spool.pending():
+                batch, offset = self.spool.read(self.batch_size)
+                if not batch:  # Uniquement des lignes illisibles, mises de côté : on avance sans rien publier
+                    if offset > self.spool.offset:
+                        self.spool.commit(offset)
+                        return True
+                    return False
+                from_memory = False
+            else:
+                with self._lock:
+                    batch, offset = list(islice(self.memory, self.batch_size)), None
+                    self._inflight_memory = len(batch)
+                if not batch:
+                    return False
+                from_memory = True
+            infos = [self.client.publish(message["topic"], message["payload"], qos=self.qos) for message in batch]
+            self._inflight = (infos, from_memory, offset)
+        infos, from_memory, offset = self._inflight
+        deadline = time.monotonic() + self.ack_timeout
+        # Lot non acquitté (liaison coupée) : paho le renvoie à la reconnexion, il est attendu sans être republié
+        while not all(info.is_published() for info in infos):
+            if self._stop.is_set() or (time.monotonic() > deadline and not self._connected.is_set()):
+                return False
+            self._spill()  # Broker lent : la mémoire ne dépasse pas queue_size pendant l'attente
+            time.sleep(0.01)
+        if from_memory:
+            with self._lock:
+                for _ in infos:
+                    self.memory.popleft()
+                self._inflight_memory = 0
+        else:
+            self.spool.commit(offset)
+        self._inflight = None
+        self.published += len(infos)
+        return True
+
+    def pending(self):
+        """Messages en attente en mémoire, et octets restant à rejouer sur disque."""
+        with self._lock:
+            return {"memory": len(self.memory), "spool_bytes": self.spool.size - self.spool.offset}
+
+    def flush(self, timeout=5.0):
+        """Attend que tous les messages soient publiés ; renvoie False si le délai est écoulé avant."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            pending = self.pending()
+            if not pending["memory"] and not pending["spool_bytes"]:
+                return True
+            self._wake.set()
+            time.sleep(0.05)
+        return False
+
+    def close(self, timeout=5.0):
+        """Publie ce qui peut l'être dans le délai, écrit le reste de la mémoire sur disque et ferme la connexion."""
+        if self._stop.is_set():
+            return
+        if self._connected.is_set():
+            self.flush(timeout)
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        with self._lock:
+            if self.memory:  # Rejoués au prochain démarrage
+                self.spool.append(list(self.memory))
+                self.spilled += len(self.memory)
+                self.memory.clear()
+                self._inflight_memory = 0
+            self.spool.close()
+        self.client.loop_stop()
+        self.client.disconnect()
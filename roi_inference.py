@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+from ultralytics.engine.results import Boxes
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+
+class RoiTracker:
+    """
+    Détection limitée à une bande autour de la région de comptage, suivie par un tracker propre.
+
+    Le modèle ne voit que le rectangle englobant la région élargi de margin pixels, à la même échelle que
+    l'image entière (imgsz réduit dans la même proportion) : le tenseur d'entrée est plus petit et les objets
+    gardent la taille apparente d'une inférence pleine image. Les boîtes sont replacées dans le repère de
+    l'image entière avant le tracker, si bien que track_history et count_objects voient les mêmes coordonnées
+    qu'avec extract_tracks. Une passe pleine image toutes les full_frame_interval images donne leurs IDs aux
+    animaux encore loin de la ligne, qui arrivent ainsi dans la bande déjà suivis.
+
+    La marge doit couvrir au moins deux positions successives d'un animal de part et d'autre de la ligne,
+    faute de quoi son franchissement peut échapper au comptage.
+    """
+
+    def __init__(self, model, region, margin=80, full_frame_interval=0, tracker="botsort.yaml", frame_rate=30,
+                 imgsz=640, **predict_args):
+        """
+        Args:
+            model: Modèle YOLO déjà chargé.
+            region (list): Points de la région de comptage, dans le repère des images traitées.
+            margin (int): Marge en pixels autour de la région.
+            full_frame_interval (int): Une passe pleine image toutes les N images (0 : jamais).
+            tracker (str): Configuration du tracker.
+            frame_rate (int): Fréquence d'images transmise au tracker.
+            imgsz (int): Taille d'inférence de l'image entière ; celle de la bande est réduite en proportion.
+            **predict_args: Arguments transmis à model.predict (conf, iou, classes, device, ...).
+        """
+        self.model = model
+        self.points = np.asarray(region, dtype=float) if region is not None else None
+        self.margin = margin
+        self.full_frame_interval = full_frame_interval
+        self.imgsz = imgsz if isinstance(imgsz, int) else max(imgsz)
+        self.predict_args = predict_args
+        cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker)))
+        self.tracker = TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+        self._crops = {}  # Forme de l'image -> (x0, y0, x1, y1, imgsz de la bande)
+        self._index = 0
+        self.roi_passes = 0
+        self.full_passes = 0
+
+    def crop(self, shape):
+        """Rectangle de la bande et taille d'inférence associée, pour des images de forme shape (calculé une fois)."""
+        key = shape[:2]
+        if key not in self._crops:
+            height, width = key
+            if self.points is None:
+                self._crops[key] = (0, 0, width, height, self.imgsz)
+            else:
+                x0, y0 = np.floor(self.points.min(axis=0) - self.margin).clip(min=0).astype(int)
+                x1, y1 = np.ceil(self.points.max(axis=0) + self.margin).astype(int)
+                x1, y1 = min(x1, width), min(y1, height)
+                scale = self.imgsz / max(height, width)
+                stride = int(self.model.model.stride.max()) if hasattr(self.model.model, "stride") else 32
+                imgsz = max(stride, math.ceil(max(x1 - x0, y1 - y0) * scale / stride) * stride)
+                self._crops[key] = (int(x0), int(y0), int(x1), int(y1), min(imgsz, self.imgsz))
+        return self._crops[key]
+
+    def track(self, frame):
+        """
+        Détecte et suit les objets d'une image.
+
+        Returns:
+            (np.ndarray): Une ligne par piste (x1, y1, x2, y2, id, score, cls, idx) dans le repère de l'image
+                entière, au format attendu par ObjectCounter.apply_tracks.
+        """
+        self._index += 1
+        full = self.full_frame_interval and self._index % self.full_frame_interval == 0
+        x0, y0, x1, y1, imgsz = (0, 0, frame.shape[1], frame.shape[0], self.imgsz) if full else self.crop(frame.shape)
+        if full or (x0, y0, x1, y1) == (0, 0, frame.shape[1], frame.shape[0]):
+            self.full_passes += 1
+        else:
+            self.roi_passes += 1
+        result = self.model.predict(frame[y0:y1, x0:x1], imgsz=imgsz, **self.predict_args)[0]
+        data = result.boxes.data.cpu().numpy().copy()
+        if not len(data):
+            return np.empty((0, 8), dtype=np.float32)
+        data[:, [0, 2]] += x0  # Retour dans le repère de l'image entière
+        data[:, [1, 3]] += y0
+        return self.tracker.update(Boxes(data, frame.shape[:2]), frame)
+
+    def stats(self):
+        """Nombre de passes sur la bande et sur l'image entière."""
+        return {"roi_passes": self.roi_passes, "full_passes": self.full_passes,
+                "crops": {f"{w}x{h}": crop for (h, w), crop in self._crops.items()}}
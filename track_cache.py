@@ -0,0 +1,191 @@
+"""
+Cache des pistes produites par ObjectCounter.extract_tracks et rejeu sans modèle.
+
+Les boîtes, IDs et classes de chaque image traitée sont écrits en colonnes binaires brutes, relues par
+np.memmap : recompter une vidéo avec une autre région ou un autre seuil ne demande plus ni décodage ni YOLO.
+
+Usage :
+    python track_cache.py record cattlecount.mp4 --model yolo11n.pt
+    python track_cache.py replay cattlecount.mp4 --model yolo11n.pt --region 569,5 569,499
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+
+CACHE_DIR = "track_cache"
+COLUMNS = {
+    "offsets": np.int64,  # offsets[i]:offsets[i + 1] délimite les pistes de l'image i
+    "boxes": np.float32,  # (N, 4) en xyxy
+    "track_ids": np.int64,
+    "clss": np.int16,
+}
+SAMPLE_BYTES = 16 * 1024 * 1024
+
+
+def video_hash(path):
+    """Empreinte d'une vidéo : taille, 16 Mo de début et 16 Mo de fin (évite de relire des Go de vidéo)."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as file:
+        digest.update(file.read(SAMPLE_BYTES))
+        if size > 2 * SAMPLE_BYTES:
+            file.seek(-SAMPLE_BYTES, os.SEEK_END)
+            digest.update(file.read(SAMPLE_BYTES))
+    return digest.hexdigest()[:16]
+
+
+def cache_path(video, model, frame_step=2, size=(1020, 500), cache_dir=CACHE_DIR):
+    """Dossier du cache associé à une vidéo, un modèle, un pas d'images et une taille de traitement."""
+    model_name = os.path.splitext(os.path.basename(str(model)))[0]
+    return os.path.join(cache_dir, f"{video_hash(video)}_{model_name}_step{frame_step}_{size[0]}x{size[1]}")
+
+
+class TrackCacheWriter:
+    """Ajoute les pistes image par image à des fichiers colonnes ; meta.json n'est écrit qu'à la fermeture."""
+
+    def __init__(self, path, names, video=None, model=None, frame_step=None, size=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {"video": video, "model": str(model), "frame_step": frame_step, "size": size,
+                     "names": {int(k): v for k, v in names.items()}}
+        meta_file = os.path.join(path, "meta.json")
+        if os.path.exists(meta_file):
+            os.remove(meta_file)  # Le cache précédent est réécrit : il n'est plus valide tant que close() n'a pas eu lieu
+        self.files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in COLUMNS}
+        self.frames = 0
+        self.rows = 0
+        self.files["offsets"].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def add(self, boxes, track_ids, clss):
+        """Enregistre les pistes d'une image (éventuellement aucune)."""
+        n = len(track_ids)
+        if n:
+            self.files["boxes"].write(np.asarray(boxes, dtype=np.float32).reshape(n, 4).tobytes())
+            self.files["track_ids"].write(np.asarray(track_ids, dtype=np.int64).tobytes())
+            self.files["clss"].write(np.asarray(clss, dtype=np.int16).tobytes())
+        self.rows += n
+        self.frames += 1
+        self.files["offsets"].write(np.array([self.rows], dtype=np.int64).tobytes())
+
+    def close(self):
+        """Ferme les colonnes et valide le cache en écrivant meta.json."""
+        for file in self.files.values():
+            file.close()
+        self.meta.update(frames=self.frames, rows=self.rows)
+        with open(os.path.join(self.path, "meta.json"), "w") as file:
+            json.dump(self.meta, file)
+
+
+class TrackCache:
+    """Lecture d'un cache de pistes par projection mémoire des colonnes."""
+
+    def __init__(self, path):
+        meta_file = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_file):
+            raise FileNotFoundError(f"Aucun cache de pistes complet dans {path}")
+        with open(meta_file) as file:
+            self.meta = json.load(file)
+        self.names = {int(k): v for k, v in self.meta["names"].items()}
+        self.frames = self.meta["frames"]
+        shapes = {"offsets": (self.frames + 1,), "boxes": (self.meta["rows"], 4)}
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            shape = shapes.get(name, (self.meta["rows"],))
+            if shape[0] == 0:
+                self.columns[name] = np.zeros(shape, dtype=dtype)  # np.memmap refuse les fichiers vides
+            else:
+                self.columns[name] = np.memmap(os.path.join(path, f"{name}.bin"), dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self):
+        return self.frames
+
+    def frame(self, i):
+        """Boîtes, IDs et classes de l'image i, au format attendu par ObjectCounter.process_tracks."""
+        start, end = self.columns["offsets"][i], self.columns["offsets"][i + 1]
+        return (
+            np.asarray(self.columns["boxes"][start:end]),
+            self.columns["track_ids"][start:end].tolist(),
+            self.columns["clss"][start:end].tolist(),
+        )
+
+
+def replay(cache, counter):
+    """
+    Rejoue les pistes du cache dans la logique de comptage, sans image ni modèle.
+
+    Args:
+        cache (TrackCache): Pistes enregistrées.
+        counter (ObjectCounter): Compteur headless, construit par exemple avec NamesOnlyModel(cache.names).
+
+    Returns:
+        (dict): Les comptages finaux (cf. ObjectCounter.counts).
+    """
+    for i in range(len(cache)):
+        counter.boxes, counter.track_ids, counter.clss = cache.frame(i)
+        counter.process_tracks(None)
+    return counter.counts()
+
+
+def record(video, model, frame_step=2, size=(1020, 500), cache_dir=CACHE_DIR, **kwargs):
+    """Décode la vidéo une fois, exécute le suivi et enregistre les pistes dans le cache."""
+    import cv2
+
+    from tracker1 import ObjectCounter
+
+    # Ne pas mélanger les événements de l'enregistrement avec ceux du direct (cf. replay)
+    kwargs.setdefault("events_dir", os.path.join(cache_dir, "record_events"))
+    counter = ObjectCounter(model=model, headless=True, **kwargs)
+    path = cache_path(video, model, frame_step, size, cache_dir)
+    counter.track_recorder = TrackCacheWriter(path, counter.names, video=video, model=model, frame_step=frame_step,
+                                              size=list(size))
+    cap = cv2.VideoCapture(video)
+    index = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        index += 1
+        if index % frame_step != 0:
+            continue
+        counter.count(cv2.resize(frame, size))
+    cap.release()
+    counter.track_recorder.close()
+    counter.event_sink.close()
+    return path, counter.counts()
+
+
+def _point(text):
+    x, y = text.split(",")
+    return int(x), int(y)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["record", "replay"])
+    parser.add_argument("video")
+    parser.add_argument("--model", default="yolo11n.pt")
+    parser.add_argument("--region", type=_point, nargs="+", default=[(569, 5), (569, 499)], help="Points x,y")
+    parser.add_argument("--frame-step", type=int, default=2, help="Une image sur N (le rejeu lit le cache de ce pas)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    if args.action == "record":
+        path, counts = record(args.video, args.model, args.frame_step, cache_dir=args.cache_dir, region=args.region)
+        print(f"Pistes enregistrées dans {path}")
+    else:
+        from tracker1 import NamesOnlyModel, ObjectCounter
+
+        cache = TrackCache(cache_path(args.video, args.model, args.frame_step, cache_dir=args.cache_dir))
+        counter = ObjectCounter(
+            model=NamesOnlyModel(cache.names),
+            region=args.region,
+            headless=True,
+            events_dir=os.path.join(args.cache_dir, "replay_events"),  # Ne pas mélanger avec les événements du direct
+        )
+        counts = replay(cache, counter)
+        counter.event_sink.close()
+    print(json.dumps(counts, ensure_ascii=False))
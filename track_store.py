@@ -0,0 +1,91 @@
+import sys
+from collections import deque
+
+
+class TrackStateStore:
+    """
+    État des pistes suivies, borné en mémoire.
+
+    Toutes les recherches se font par dict/set (O(1)) et l'historique de chaque piste est un deque de
+    longueur fixe. Une piste absente depuis plus de max_age images est oubliée, y compris son
+    appartenance à counted/saved : le tracker ne réattribue pas un ID perdu, le garder ne sert donc
+    plus à éviter un double comptage.
+
+    Le store n'est pas protégé par un verrou : seul le thread de comptage le lit et le modifie. Les autres
+    threads (rapports, métriques) lisent snapshot, un résumé recalculé par ce thread toutes les
+    snapshot_every images et remplacé d'un bloc.
+    """
+
+    def __init__(self, history_len=30, max_age=90, snapshot_every=30):
+        """
+        Args:
+            history_len (int): Nombre de positions conservées par piste.
+            max_age (int): Nombre d'images sans détection au-delà duquel une piste est évincée.
+                Doit rester supérieur au track_buffer du tracker pour ne jamais recompter une piste.
+            snapshot_every (int): Intervalle en images entre deux mises à jour de snapshot.
+        """
+        self.history_len = history_len
+        self.max_age = max_age
+        self.snapshot_every = snapshot_every
+        self.frame_idx = 0
+        self.history = {}  # track_id -> deque des centroïdes récents
+        self.last_seen = {}  # track_id -> indice de la dernière image où la piste a été vue
+        self.counted = set()  # IDs déjà comptés
+        self.saved = set()  # IDs déjà enregistrés dans le fichier d'événements
+        self.evicted = 0  # Nombre total de pistes évincées
+        self.snapshot = self.stats()  # Dernier résumé publié, lisible depuis n'importe quel thread
+
+    def next_frame(self):
+        """Passe à l'image suivante et évince les pistes périmées."""
+        self.frame_idx += 1
+        self.evict_stale()
+        if self.frame_idx % self.snapshot_every == 0:
+            self.snapshot = self.stats()
+
+    def update(self, track_id, point):
+        """Ajoute la position courante d'une piste et la marque comme vue sur l'image courante."""
+        history = self.history.get(track_id)
+        if history is None:
+            history = self.history[track_id] = deque(maxlen=self.history_len)
+        history.append(point)
+        self.last_seen[track_id] = self.frame_idx
+
+    def previous_position(self, track_id):
+        """Avant-dernière position connue de la piste, ou None si elle n'a qu'un point."""
+        history = self.history.get(track_id)
+        return history[-2] if history is not None and len(history) > 1 else None
+
+    def evict_stale(self):
+        """Oublie les pistes non vues depuis plus de max_age images."""
+        limit = self.frame_idx - self.max_age
+        stale = [track_id for track_id, seen in self.last_seen.items() if seen < limit]
+        for track_id in stale:
+            del self.last_seen[track_id]
+            self.history.pop(track_id, None)
+            self.counted.discard(track_id)
+            self.saved.discard(track_id)
+        self.evicted += len(stale)
+
+    def __len__(self):
+        return len(self.last_seen)
+
+    def memory_usage(self):
+        """Estimation en octets de la mémoire occupée par l'état des pistes (conteneurs et points)."""
+        total = sum(sys.getsizeof(c) for c in (self.history, self.last_seen, self.counted, self.saved))
+        for history in self.history.values():
+            total += sys.getsizeof(history) + sum(sys.getsizeof(point) for point in history)
+        return total
+
+    def stats(self):
+        """
+        Résumé de l'état du store, à journaliser pour vérifier que la mémoire reste stable.
+
+        Parcourt les conteneurs : à n'appeler que depuis le thread de comptage (ailleurs, lire snapshot).
+        """
+        return {
+            "frame": self.frame_idx,
+            "active_tracks": len(self.last_seen),
+            "counted_ids": len(self.counted),
+            "evicted_tracks": self.evicted,
+            "memory_bytes": self.memory_usage(),
+        }
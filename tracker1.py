@@ -1,9 +1,32 @@
 from ultralytics.solutions.solutions import BaseSolution
+from ultralytics.utils import DEFAULT_CFG_DICT, DEFAULT_SOL_DICT
+from ultralytics.utils.checks import check_imshow
 from ultralytics.utils.plotting import Annotator, colors
-import csv
-from datetime import datetime
+
 import os
-import pyttsx3
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from alerts import shared_alert_worker
+from crossing import points_in_polygon, segments_intersect
+from event_sink import EventSink
+from metrics import NULL_METRICS
+from track_store import TrackStateStore
+
+
+class NamesOnlyModel:
+    """
+    Remplaçant de modèle ne portant que les noms de classes.
+
+    Permet de construire un ObjectCounter sans charger de poids YOLO, pour rejouer des pistes déjà
+    calculées (process_tracks) ; extract_tracks n'est alors pas utilisable.
+    """
+
+    def __init__(self, names):
+        self.names = dict(names)
 
 
 class ObjectCounter(BaseSolution):
@@ -11,43 +34,138 @@ class ObjectCounter(BaseSolution):
     Une classe pour gérer le comptage d'objets dans un flux vidéo en temps réel basé sur leur suivi.
     
     La classe permet de compter les objets entrant et sortant d'une région définie. 
-    Une méthode finalize() permet de déclencher une alerte vocale à la fin du flux si le nombre de vaches entrantes est insuffisant.
+    Une alerte vocale est déclenchée, sans bloquer le comptage, quand les vaches attendues sont toutes entrées pendant
+    le flux, et par finalize() en fin de flux si le nombre de vaches entrantes est insuffisant.
     """
 
     def __init__(self, **kwargs):
-        """Initialise la classe ObjectCounter pour le comptage en temps réel."""
-        super().__init__(**kwargs)
+        """
+        Initialise la classe ObjectCounter pour le comptage en temps réel.
+
+        `model` peut être un chemin de poids, chargé par BaseSolution, ou un modèle YOLO déjà chargé : celui-ci est
+        alors partagé sans recharger les poids (plusieurs compteurs sur un seul modèle, cf. multi_cam.py).
+        """
+        model = kwargs.get("model")
+        if model is None or isinstance(model, (str, os.PathLike)):
+            super().__init__(**kwargs)
+        else:
+            self._init_with_model(**kwargs)
 
         self.in_count = 0  # Compteur pour les objets se dirigeant vers l'intérieur
         self.out_count = 0  # Compteur pour les objets se dirigeant vers l'extérieur
-        self.counted_ids = []  # Liste des IDs déjà comptés
-        self.saved_ids = []  # Liste des IDs déjà enregistrés dans le CSV
+        # État des pistes borné : historiques de longueur fixe, pistes périmées évincées après max_track_age images
+        self.track_state = TrackStateStore(
+            history_len=self.CFG.get("history_len", 30), max_age=self.CFG.get("max_track_age", 90)
+        )
+        self.track_history = self.track_state.history
+        self.counted_ids = self.track_state.counted  # Ensemble des IDs déjà comptés
+        self.saved_ids = self.track_state.saved  # Ensemble des IDs déjà enregistrés dans le CSV
         self.classwise_counts = {}  # Dictionnaire de comptages par classe
         self.region_initialized = False  # Indique si la région de comptage est initialisée
-        self.engine = pyttsx3.init()
-        self.engine.setProperty('rate', 150)
-        self.expected_count = 10  # Seuil attendu pour le nombre de vaches entrantes
+        # Écriture des événements comptés par lots, dans un thread dédié (csv ou parquet)
+        self.event_sink = EventSink(
+            directory=self.CFG.get("events_dir", "."),
+            fmt=self.CFG.get("events_format", "csv"),
+            batch_size=self.CFG.get("events_batch_size", 64),
+            flush_interval=self.CFG.get("events_flush_interval", 2.0),
+        )
+        # Alertes lues par un thread partagé, créé à la première alerte (pyttsx3 n'est initialisé qu'à ce moment-là)
+        self.alert_worker = None
+        self.alerts = self.CFG.get("alerts", True)  # False : alertes affichées seulement (traitement par lots, serveurs)
+        self.expected_count = self.CFG.get("expected_count", 10)  # Seuil attendu pour le nombre de vaches entrantes
 
         self.show_in = self.CFG.get("show_in", True)
         self.show_out = self.CFG.get("show_out", True)
+        # Test de franchissement NumPy en lot (mêmes décisions que le chemin shapely objet par objet)
+        self.vectorized_counting = self.CFG.get("vectorized_counting", True)
+        self.metrics = NULL_METRICS  # Instrumentation par étage, remplacée par PipelineRunner(metrics=...)
+        self.track_recorder = None  # TrackCacheWriter enregistrant les pistes de chaque image (cf. track_cache.py)
+        # Inférence limitée à une bande autour de la région (cf. roi_inference.py), passe pleine image toutes les
+        # full_frame_interval images pour garder les IDs des animaux encore loin de la ligne
+        self.roi_inference = self.CFG.get("roi_inference", False)
+        self.roi_tracker = None
+        self.publisher = None  # Publisher MQTT recevant les franchissements et le bilan de fin de flux (cf. publisher.py)
+        # Mode sans écran : suivi et comptage uniquement, avec une capture annotée optionnelle toutes les N secondes
+        self.headless = self.CFG.get("headless", False)
+        self.snapshot_interval = self.CFG.get("snapshot_interval", 0)
+        self.snapshot_dir = self.CFG.get("snapshot_dir", "snapshots")
+        self._next_snapshot = 0.0
+
+    def _init_with_model(self, model, **kwargs):
+        """Équivalent de BaseSolution.__init__ avec un modèle déjà chargé, sans relire les poids."""
+        from shapely.geometry import LineString, Point, Polygon
+        from shapely.prepared import prep
+
+        self.LineString = LineString
+        self.Polygon = Polygon
+        self.Point = Point
+        self.prep = prep
+
+        DEFAULT_SOL_DICT.update(kwargs)
+        DEFAULT_CFG_DICT.update(kwargs)
+        self.CFG = {**DEFAULT_SOL_DICT, **DEFAULT_CFG_DICT}
+        self.region = self.CFG["region"]
+        self.line_width = self.CFG["line_width"] if self.CFG["line_width"] is not None else 2
+
+        self.model = model
+        self.names = model.names
+        self.track_add_args = {
+            k: self.CFG[k] for k in ["verbose", "iou", "conf", "device", "max_det", "half", "tracker"]
+        }
+        # Sans écran, le test d'affichage (ouverture d'une fenêtre) est inutile
+        self.env_check = False if self.CFG.get("headless", False) else check_imshow(warn=True)
 
     def save_label_to_csv(self, track_id, label):
-        """Enregistre le label, track_id et l'heure actuelle dans un fichier CSV dont le nom est basé sur la date."""
+        """Transmet le label et le track_id au puits d'événements, qui les écrit en arrière-plan dans le fichier du jour."""
         if track_id in self.saved_ids:
             return  # On ne sauvegarde pas plusieurs fois le même ID
 
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        current_date = datetime.now().strftime("%Y-%m-%d")  # Date du jour
+        with self.metrics.timer("csv_write"):
+            self.event_sink.emit(track_id, label)
+        self.saved_ids.add(track_id)
 
-        filename = f'tracked_objects_{current_date}.csv'
-        file_exists = os.path.isfile(filename)
+    def initialize_region(self):
+        """Initialise la région de comptage et précalcule une fois pour toutes sa géométrie."""
+        super().initialize_region()
+        self.region_array = np.asarray(self.region, dtype=float)
+        if len(self.region) == 2:  # Région linéaire
+            self.region_shape = self.LineString(self.region)
+            dx, dy = np.abs(self.region_array[0] - self.region_array[1])
+        else:  # Région polygonale
+            self.region_shape = self.Polygon(self.region)
+            dx, dy = self.region_array.max(axis=0) - self.region_array.min(axis=0)
+        # Région plutôt verticale : le sens se lit sur x, sinon sur y
+        self.region_vertical = bool(dx < dy)
+
+    def alert(self, message):
+        """Confie une alerte au thread d'alertes, sans attendre sa lecture ; l'affiche seulement si alerts=False."""
+        if not self.alerts:
+            print(message)
+            return
+        if self.alert_worker is None:
+            self.alert_worker = shared_alert_worker()
+        self.alert_worker.alert(message)
 
-        with open(filename, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(['track_id', 'label', 'date', 'time'])
-            writer.writerow([track_id, label, current_time.split()[0], current_time.split()[1]])
-            self.saved_ids.append(track_id)
+    def _record_crossing(self, track_id, cls, inward):
+        """Incrémente les compteurs IN/OUT d'un objet ayant franchi la région et marque son ID comme compté."""
+        if inward:
+            self.in_count += 1
+            self.classwise_counts[self.names[cls]]["IN"] += 1
+            if self.names[cls].lower() == "cow" and self.classwise_counts[self.names[cls]]["IN"] == self.expected_count:
+                self.alert(f"Les {self.expected_count} vaches attendues sont entrées.")
+        else:
+            self.out_count += 1
+            self.classwise_counts[self.names[cls]]["OUT"] += 1
+        self.counted_ids.add(track_id)
+        if self.publisher is not None:  # Dépôt non bloquant : la publication a lieu dans le thread du publisher
+            self.publisher.publish_attribute("count_event", {
+                "track_id": int(track_id),
+                "label": self.names[cls],
+                "direction": "IN" if inward else "OUT",
+                "time": int(time.time() * 1000),
+                "in": self.in_count,
+                "out": self.out_count,
+            })
 
     def count_objects(self, current_centroid, track_id, prev_position, cls):
         """
@@ -63,45 +181,51 @@ class ObjectCounter(BaseSolution):
             return
 
         if len(self.region) == 2:  # Région linéaire
-            line = self.LineString(self.region)
-            if line.intersects(self.LineString([prev_position, current_centroid])):
-                if abs(self.region[0][0] - self.region[1][0]) < abs(self.region[0][1] - self.region[1][1]):
-                    if current_centroid[0] > prev_position[0]:
-                        self.in_count += 1
-                        self.classwise_counts[self.names[cls]]["IN"] += 1
-                    else:
-                        self.out_count += 1
-                        self.classwise_counts[self.names[cls]]["OUT"] += 1
-                else:
-                    if current_centroid[1] > prev_position[1]:
-                        self.in_count += 1
-                        self.classwise_counts[self.names[cls]]["IN"] += 1
-                    else:
-                        self.out_count += 1
-                        self.classwise_counts[self.names[cls]]["OUT"] += 1
-                self.counted_ids.append(track_id)
-
+            crossed = self.region_shape.intersects(self.LineString([prev_position, current_centroid]))
         elif len(self.region) > 2:  # Région polygonale
-            polygon = self.Polygon(self.region)
-            if polygon.contains(self.Point(current_centroid)):
-                region_width = max([p[0] for p in self.region]) - min([p[0] for p in self.region])
-                region_height = max([p[1] for p in self.region]) - min([p[1] for p in self.region])
-
-                if region_width < region_height:
-                    if current_centroid[0] > prev_position[0]:
-                        self.in_count += 1
-                        self.classwise_counts[self.names[cls]]["IN"] += 1
-                    else:
-                        self.out_count += 1
-                        self.classwise_counts[self.names[cls]]["OUT"] += 1
-                else:
-                    if current_centroid[1] > prev_position[1]:
-                        self.in_count += 1
-                        self.classwise_counts[self.names[cls]]["IN"] += 1
-                    else:
-                        self.out_count += 1
-                        self.classwise_counts[self.names[cls]]["OUT"] += 1
-                self.counted_ids.append(track_id)
+            crossed = self.region_shape.contains(self.Point(current_centroid))
+        else:
+            return
+
+        if crossed:
+            axis = 0 if self.region_vertical else 1
+            self._record_crossing(track_id, cls, current_centroid[axis] > prev_position[axis])
+
+    def count_objects_batch(self, centroids, prev_positions, track_ids, clss):
+        """
+        Version vectorisée de count_objects : teste en un seul appel NumPy toutes les pistes de l'image.
+
+        Args:
+            centroids (List[Tuple[float, float]]): Centroïdes courants, un par piste.
+            prev_positions (List[Tuple[float, float] | None]): Positions précédentes (None si inconnue).
+            track_ids (List[int]): Identifiants des pistes.
+            clss (List[int]): Index de classe des pistes.
+        """
+        if len(self.region) < 2:
+            return
+        candidates = [
+            i for i, (prev, track_id) in enumerate(zip(prev_positions, track_ids))
+            if prev is not None and track_id not in self.counted_ids
+        ]
+        if not candidates:
+            return
+
+        current = np.array([centroids[i] for i in candidates], dtype=float)
+        previous = np.array([prev_positions[i] for i in candidates], dtype=float)
+        if len(self.region) == 2:
+            crossed = segments_intersect(previous, current, self.region_array[0], self.region_array[1])
+        else:
+            crossed = points_in_polygon(current, self.region_array)
+        axis = 0 if self.region_vertical else 1
+        inward = current[:, axis] > previous[:, axis]
+
+        for i, hit, is_in in zip(candidates, crossed.tolist(), inward.tolist()):
+            if hit:
+                self._record_crossing(track_ids[i], clss[i], is_in)
+
+    def store_tracking_history(self, track_id, box):
+        """Ajoute le centroïde de la boîte à l'historique borné de la piste."""
+        self.track_state.update(track_id, (float(box[0] + box[2]) / 2, float(box[1] + box[3]) / 2))
 
     def store_classwise_counts(self, cls):
         """Initialise le comptage par classe si nécessaire."""
@@ -120,51 +244,147 @@ class ObjectCounter(BaseSolution):
         if labels_dict:
             self.annotator.display_analytics(im0, labels_dict, (104, 31, 17), (255, 255, 255), 10)
 
-        for track_id in self.track_ids:
+        for box, track_id in zip(self.boxes, self.track_ids):
             if track_id in self.counted_ids:
                 in_count = self.in_count
                 label = f"cow ID:{track_id} count at number {in_count}"
-                self.annotator.box_label(self.boxes[self.track_ids.index(track_id)], label=label, color=(255, 255, 0))
+                self.annotator.box_label(box, label=label, color=(255, 255, 0))
                 self.save_label_to_csv(track_id, label)
-    
+
+    def record_counts(self):
+        """Enregistre les objets comptés de l'image courante sans rien dessiner (mode headless)."""
+        for track_id in self.track_ids:
+            if track_id in self.counted_ids and track_id not in self.saved_ids:
+                self.save_label_to_csv(track_id, f"cow ID:{track_id} count at number {self.in_count}")
+
+    def counts(self):
+        """Comptages courants, sous une forme sérialisable (sortie du mode headless)."""
+        return {
+            "in": self.in_count,
+            "out": self.out_count,
+            "classwise": {key: dict(value) for key, value in self.classwise_counts.items()},
+        }
+
+    def _snapshot_due(self):
+        """Indique si une capture annotée doit être produite pour cette image en mode headless."""
+        if not self.snapshot_interval:
+            return False
+        now = time.monotonic()
+        if now < self._next_snapshot:
+            return False
+        self._next_snapshot = now + self.snapshot_interval
+        return True
+
+    def save_snapshot(self, im0):
+        """Écrit l'image annotée dans snapshot_dir (débogage des machines sans écran)."""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        filename = os.path.join(self.snapshot_dir, f"snapshot_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.jpg")
+        cv2.imwrite(filename, im0)
+
+    def apply_tracks(self, tracks):
+        """
+        Charge des pistes produites hors de extract_tracks (par ex. par un tracker partagé en mode multi-caméras).
+
+        Args:
+            tracks (np.ndarray): Sortie d'un tracker Ultralytics, une ligne par piste (x1, y1, x2, y2, id, score, cls, idx).
+        """
+        if len(tracks):
+            self.boxes = tracks[:, :4]
+            self.track_ids = tracks[:, 4].astype(int).tolist()
+            self.clss = tracks[:, 6].astype(int).tolist()
+        else:
+            self.boxes, self.track_ids, self.clss = [], [], []
+
+    def extract_roi_tracks(self, im0):
+        """Équivalent de extract_tracks avec détection sur la seule bande entourant la région de comptage."""
+        if not self.region_initialized:
+            self.initialize_region()
+            self.region_initialized = True
+        if self.roi_tracker is None:
+            # Import différé : ultralytics.trackers n'est chargé que si roi_inference est activé
+            from roi_inference import RoiTracker
+
+            predict_args = {k: v for k, v in self.track_add_args.items() if k != "tracker"}
+            self.roi_tracker = RoiTracker(
+                self.model,
+                self.region,
+                margin=self.CFG.get("roi_margin", 80),
+                full_frame_interval=self.CFG.get("full_frame_interval", 0),
+                tracker=self.track_add_args["tracker"],
+                imgsz=self.CFG.get("imgsz", 640),
+                classes=self.CFG["classes"],
+                **predict_args,
+            )
+        self.apply_tracks(self.roi_tracker.track(im0))
+
     def count(self, im0):
         """Traite les images et met à jour les comptages."""
+        with self.metrics.timer("extract_tracks"):
+            if self.roi_inference:
+                self.extract_roi_tracks(im0)
+            else:
+                self.extract_tracks(im0)
+        if self.track_recorder is not None:
+            self.track_recorder.add(self.boxes, self.track_ids, self.clss)
+        return self.process_tracks(im0)
+
+    def process_tracks(self, im0):
+        """Met à jour les comptages et annote l'image à partir des pistes courantes (boxes, track_ids, clss)."""
         if not self.region_initialized:
             self.initialize_region()
             self.region_initialized = True
+        self.track_state.next_frame()
 
-        self.annotator = Annotator(im0, line_width=self.line_width)
-        self.extract_tracks(im0)
-        self.annotator.draw_region(reg_pts=self.region, color=(104, 0, 123), thickness=self.line_width * 2)
+        with self.metrics.timer("counting"):
+            centroids, prev_positions = [], []
+            for box, track_id, cls in zip(self.boxes, self.track_ids, self.clss):
+                self.store_tracking_history(track_id, box)
+                self.store_classwise_counts(cls)
+                centroids.append(self.track_history[track_id][-1])
+                prev_positions.append(self.track_state.previous_position(track_id))
 
-        for box, track_id, cls in zip(self.boxes, self.track_ids, self.clss):
-            self.store_tracking_history(track_id, box)
-            self.store_classwise_counts(cls)
+            if self.vectorized_counting:
+                self.count_objects_batch(centroids, prev_positions, self.track_ids, self.clss)
+            else:
+                for centroid, track_id, prev_position, cls in zip(centroids, self.track_ids, prev_positions, self.clss):
+                    self.count_objects(centroid, track_id, prev_position, cls)
 
-            label = f"{self.names[cls]} ID: {track_id}"
-            self.annotator.box_label(box, label=label, color=colors(cls, True))
+        if self.headless and not self._snapshot_due():
+            self.record_counts()
+            return im0
 
-            current_centroid = ((box[0] + box[2]) / 2, (box[1] + box[3]) / 2)
-            prev_position = self.track_history[track_id][-2] if len(self.track_history[track_id]) > 1 else None
-            self.count_objects(current_centroid, track_id, prev_position, cls)
+        with self.metrics.timer("annotation"):
+            self.annotator = Annotator(im0, line_width=self.line_width)
+            self.annotator.draw_region(reg_pts=self.region, color=(104, 0, 123), thickness=self.line_width * 2)
+            for box, track_id, cls in zip(self.boxes, self.track_ids, self.clss):
+                label = f"{self.names[cls]} ID: {track_id}"
+                self.annotator.box_label(box, label=label, color=colors(cls, True))
+            self.display_counts(im0)
 
-        self.display_counts(im0)
-        self.display_output(im0)
+        if self.headless:
+            self.save_snapshot(im0)
+        else:
+            with self.metrics.timer("display_output"):
+                self.display_output(im0)
         return im0
 
     def finalize(self):
         """
         Méthode à appeler en fin de flux pour vérifier le nombre de vaches entrantes et déclencher l'alerte si nécessaire.
+        L'alerte est lue par le thread d'alertes : finalize() rend la main sans attendre la fin de la synthèse vocale.
         """
+        self.event_sink.close()
         cow_count = None
         for key, value in self.classwise_counts.items():
             if key.lower() == "cow":
                 cow_count = value["IN"]
                 break
+        if self.publisher is not None:
+            summary = self.counts()
+            summary.update(expected=self.expected_count, cow_in=cow_count, time=int(time.time() * 1000))
+            self.publisher.publish_attribute("count_summary", summary)
         if cow_count is not None and cow_count < self.expected_count:
             missing_count=self.expected_count - cow_count
-            alert_message = f"Alerte : il manque {missing_count} vaches."
-            self.engine.say(alert_message)
-            self.engine.runAndWait()
+            self.alert(f"Alerte : il manque {missing_count} vaches.")
         else:
             print('Ok c\'est super')